@@ -0,0 +1,204 @@
+"""
+Benchmarks for the seating engines, on generated layouts.
+
+Each measurement is written as one JSON object per line: what was measured
+(load, compile, step or converge), the engine, part and layout, the wall time,
+and the peak memory allocated while doing it (from a second, traced run).
+Compile covers building the neighbourhood index and the step function, which
+for the array engine's line of sight kernel is most of its memory. Pass an
+earlier run's output as --baseline to fail when anything got slower.
+
+Usage:
+    python benchmark.py [--size N] [--floor F] [--seed S] [--output FILE]
+                        [--engines matrix array ...] [--workers 1 2 4]
+                        [--baseline FILE] [--tolerance 0.25]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from seating import ArrayBoard, BitBoard, Board, Engine, FrontierBoard, Neighbourhood
+from seating import Part, RULES, TiledBoard
+
+
+def random_layout(size: int, floor: float = 0.4, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return '\n'.join(
+        ''.join('.' if rng.random() < floor else 'L' for _ in range(size))
+        for _ in range(size))
+
+
+def measure(func: Callable, repeat: int = 1,
+            setup: Optional[Callable[[], object]] = None) -> Tuple[float, int, object]:
+    """
+    Mean seconds per call over repeat calls, then the peak bytes allocated by
+    one more call under tracemalloc (which is too slow to time alongside).
+    With setup, each call is passed its own result of setup, all made before
+    the timer starts. Returns (seconds, peak_bytes, result of the last untraced call).
+    """
+    args = [(setup(),) if setup else () for _ in range(repeat + 1)]
+
+    start = time.perf_counter()
+    for i in range(repeat):
+        result = func(*args[i])
+    seconds = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    try:
+        func(*args[repeat])
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return seconds, peak, result
+
+
+def loaders() -> Dict[Engine, Callable[[str], object]]:
+    return {
+        Engine.matrix: Board.from_file,
+        Engine.array: ArrayBoard.from_file,
+        Engine.bits: BitBoard.from_file,
+    }
+
+
+def stepper(board: Board, engine: Engine,
+            part: Part) -> Tuple[Callable, Optional[Callable[[], object]]]:
+    """
+    One generation from the initial layout, with the rule compiled up front,
+    and the setup for measure when a step uses up its board.
+    """
+    rule = RULES[part]
+    if engine == Engine.matrix:
+        step = board._compile(rule)
+        out = [row[:] for row in board.matrix]
+        return lambda: step(board.matrix, out), None
+    if engine == Engine.array:
+        array_board = ArrayBoard.from_board(board)
+        step = array_board._compile(rule)
+        return lambda: step(array_board.cells), None
+    if engine == Engine.bits:
+        bit_board = BitBoard.from_board(board)
+        step = bit_board._compile(rule)
+        return lambda: step(bit_board.full), None
+    if engine == Engine.frontier:
+        # The first generation evaluates every seat, so this is the worst case.
+        # Stepping moves the board on, so each step gets a fresh one.
+        board.index(rule.neighbourhood)
+        return FrontierBoard.step, lambda: FrontierBoard.from_board(board, rule)
+    raise ValueError(engine)
+
+
+def supported(engine: Engine, part: Part) -> bool:
+    return engine != Engine.bits or RULES[part].neighbourhood == Neighbourhood.adjacent
+
+
+def run(args) -> Iterator[dict]:
+    layout = random_layout(args.size, args.floor, args.seed)
+    common = dict(size=args.size, floor=args.floor, seed=args.seed)
+
+    with tempfile.NamedTemporaryFile('wt', suffix='.layout', delete=False) as f:
+        f.write(layout)
+    try:
+        for engine, load in loaders().items():
+            if engine in args.engines:
+                seconds, peak, _ = measure(lambda: load(f.name))
+                yield dict(benchmark='load', engine=engine.name, part=None,
+                           workers=1, seconds=seconds, peak_bytes=peak, **common)
+    finally:
+        os.remove(f.name)
+
+    board = Board.from_str(layout)
+    for part in Part:
+        for engine in args.engines:
+            if not supported(engine, part):
+                continue
+
+            step, setup = stepper(board, engine, part)
+            # A fresh board, so the index is built again too
+            seconds, peak, _ = measure(lambda: stepper(Board(board.matrix), engine, part))
+            yield dict(benchmark='compile', engine=engine.name, part=part.name,
+                       workers=1, seconds=seconds, peak_bytes=peak, **common)
+
+            seconds, peak, _ = measure(step, args.steps, setup)
+            yield dict(benchmark='step', engine=engine.name, part=part.name,
+                       workers=1, seconds=seconds, peak_bytes=peak, **common)
+
+            for workers in args.workers:
+                if workers > 1 and engine != Engine.array:
+                    continue
+                seconds, peak, result = measure(
+                    lambda: converge(board, engine, part, workers, args.max_steps))
+                yield dict(benchmark='converge', engine=engine.name, part=part.name,
+                           workers=workers, seconds=seconds, peak_bytes=peak,
+                           result=result, **common)
+
+
+def converge(board: Board, engine: Engine, part: Part, workers: int, max_steps: int):
+    """Occupied seats, or the reason there's no answer (e.g. 'time out')."""
+    try:
+        if workers > 1:
+            tiled = TiledBoard(ArrayBoard.from_board(board), workers)
+            return tiled.run(RULES[part], max_steps)
+        return board.run(RULES[part], engine, max_steps)
+    except RuntimeError as e:
+        return str(e)
+
+
+def key(record: dict) -> tuple:
+    return tuple(record[k] for k in ('benchmark', 'engine', 'part', 'workers',
+                                     'size', 'floor', 'seed'))
+
+
+def regressions(records: List[dict], baseline_path: str, tolerance: float) -> List[str]:
+    """Measurements more than tolerance (a fraction) slower than the baseline."""
+    with open(baseline_path, 'rt') as baseline_file:
+        baseline = {key(r): r for r in map(json.loads, baseline_file) if r}
+
+    found = []
+    for record in records:
+        old = baseline.get(key(record))
+        if old is not None and record['seconds'] > old['seconds'] * (1 + tolerance):
+            found.append(f"{' '.join(map(str, key(record)))}: "
+                         f"{old['seconds']:.4f}s -> {record['seconds']:.4f}s")
+    return found
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=300, help='rows and columns')
+    parser.add_argument('--floor', type=float, default=0.4, help='fraction of floor cells')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--steps', type=int, default=3, help='generations to average')
+    parser.add_argument('--max-steps', type=int, default=1000)
+    parser.add_argument('--engines', nargs='+', default=list(Engine),
+                        type=lambda name: Engine[name])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1])
+    parser.add_argument('--output', help='write results here instead of stdout')
+    parser.add_argument('--baseline', help='results of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    out = open(args.output, 'wt') if args.output else sys.stdout
+    records = []
+    try:
+        for record in run(args):
+            records.append(record)
+            print(json.dumps(record), file=out, flush=True)
+    finally:
+        if args.output:
+            out.close()
+
+    if args.baseline:
+        slower = regressions(records, args.baseline, args.tolerance)
+        for line in slower:
+            print('regression:', line, file=sys.stderr)
+        sys.exit(1 if slower else 0)
@@ -5,9 +5,16 @@ https://adventofcode.com/2020/day/11
 """
 from __future__ import annotations
 
-from typing import List
+from array import array
+from bisect import bisect_left
+from itertools import accumulate, chain
+from multiprocessing import Pipe, Process, shared_memory
+from multiprocessing.connection import Connection
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
 import enum
+import mmap
 import operator
+import random
 
 class Values(enum.IntEnum):
     floor = 0
@@ -35,8 +42,317 @@ class Part(enum.Enum):
     one = enum.auto()
     two = enum.auto()
 
+class Engine(enum.Enum):
+    matrix = enum.auto() # Board, list of lists of Values
+    array = enum.auto() # ArrayBoard, flat bytearray of cell codes
+    frontier = enum.auto() # FrontierBoard, only revisits seats near a change
+    bits = enum.auto() # BitBoard, seat and occupied bitplanes (adjacent only)
+
+class Neighbourhood(enum.Enum):
+    adjacent = enum.auto() # the eight surrounding cells
+    line_of_sight = enum.auto() # the first seat in each of the eight directions
+
+class Rule(NamedTuple):
+    """
+    A variant of the seating rules. An empty seat fills when at most birth of
+    its neighbours are occupied, and an occupied seat empties when at least
+    death of them are.
+    """
+    neighbourhood: Neighbourhood
+    birth: int
+    death: int
+
+    def table(self) -> bytes:
+        """
+        Lookup table indexed by (cell << 4 | occupied_neighbours), giving the
+        cell's next value. Floor maps to floor regardless of the count. This is
+        what every engine compiles the rule down to, so stepping never has to
+        branch on which rule is running.
+        """
+        table = bytearray(256)
+        for count in range(16):
+            table[Values.empty << 4 | count] = Values.full if count <= self.birth else Values.empty
+            table[Values.full << 4 | count] = Values.empty if count >= self.death else Values.full
+        return bytes(table)
+
+RULES = {
+    Part.one: Rule(Neighbourhood.adjacent, birth=0, death=4),
+    Part.two: Rule(Neighbourhood.line_of_sight, birth=0, death=5),
+}
+
+# Generations any engine runs before giving up, unless told otherwise. Far
+# more than a layout that settles needs, but it means one that never settles
+# fails instead of hanging. Pass max_steps=None to run without a limit.
+MAX_STEPS = 10_000
+
+def _rule(rule: Union[Part, Rule]) -> Rule:
+    """Parts are shorthand for their puzzle's rules."""
+    return RULES[rule] if isinstance(rule, Part) else rule
+
+class _History:
+    """
+    Hashes of up to size recent generations, to spot a state that repeats.
+    Cycles longer than that go undetected, and a false match needs a 64 bit
+    hash collision, so isn't a practical concern.
+    """
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+        self._seen: Dict[int, int] = dict() # hash to generation, oldest first
+
+    def repeat(self, key: int, generation: int) -> int:
+        """
+        Remember the hash of a generation, or if it was seen before, return the
+        period of the cycle. Otherwise returns 0.
+        """
+        seen = self._seen
+        if key in seen:
+            return generation - seen[key]
+
+        seen[key] = generation
+        if len(seen) > self.size:
+            del seen[next(iter(seen))] # oldest
+        return 0
+
 Matrix = List[List[Values]]
 
+# Maps a cell code to 1 if the seat is occupied, else 0.
+_FULL = bytes.maketrans(
+    bytes([Values.floor, Values.empty, Values.full]),
+    bytes([0, 0, 1]))
+
+class Visibility(NamedTuple):
+    """
+    Neighbourhood index, in compressed sparse row form. Named for part two's
+    line of sight, but also used for adjacent seats.
+
+    Seats are numbered in row-major order. Seat k sits at flat index seats[k],
+    and sees seats neighbours[offsets[k]:offsets[k+1]] (by seat number).
+    ordinals maps each flat index back to its seat number, or len(seats) for
+    floor.
+    """
+    seats: array
+    ordinals: array
+    offsets: array
+    neighbours: array
+
+def _build_visibility(cells: Sequence[int], height: int, width: int,
+                      adjacent: bool = False) -> Visibility:
+    """
+    Since floor never changes, neither do the seats each seat can see. Sweep
+    each row, column and diagonal once, linking every seat to the previous seat
+    on the same line, in both directions.
+
+    With adjacent=True, floor blocks the view, giving the part one neighbours.
+
+    The lines are swept twice, first counting each seat's links to lay out the
+    offsets, then writing the links straight into place, so nothing more than
+    the int32 arrays of the result is ever allocated.
+    """
+    seats = array('i', (i for i, v in enumerate(cells) if v != Values.floor))
+    floor = len(seats)
+    ordinals = array('i', [floor]) * len(cells)
+    for k, i in enumerate(seats):
+        ordinals[i] = k
+
+    def links() -> Iterator[Tuple[int, int]]:
+        for dx, dy in [(1, 0), (0, 1), (1, 1), (-1, 1)]:
+            starts = []
+            if dy:
+                starts += [(0, c) for c in range(width)] # top row
+            if dx:
+                edge = 0 if dx > 0 else width - 1
+                starts += [(r, edge) for r in range(1 if dy else 0, height)]
+
+            for row, col in starts:
+                last = -1
+                while 0 <= row < height and 0 <= col < width:
+                    k = ordinals[row * width + col]
+                    if k != floor:
+                        if last >= 0:
+                            yield last, k
+                        last = k
+                    elif adjacent:
+                        last = -1
+                    row += dy
+                    col += dx
+
+    counts = array('i', [0]) * floor
+    for a, b in links():
+        counts[a] += 1
+        counts[b] += 1
+    offsets = array('i', accumulate(counts, initial=0))
+    del counts
+
+    # Fill each seat's run from its start, moving offsets[k] along as it goes.
+    # That leaves offsets[k] where seat k + 1 starts, so shift them back one.
+    neighbours = array('i', [0]) * offsets[floor]
+    for a, b in links():
+        neighbours[offsets[a]] = b
+        offsets[a] += 1
+        neighbours[offsets[b]] = a
+        offsets[b] += 1
+    offsets.pop()
+    offsets.insert(0, 0)
+
+    return Visibility(seats, ordinals, offsets, neighbours)
+
+def _gatherer(indices: Sequence[int]):
+    """
+    Like operator.itemgetter(*indices), but always returns a tuple. Calling it
+    fetches every index in one C loop, several times faster than mapping
+    __getitem__ over the indices.
+    """
+    if len(indices) == 1:
+        index = indices[0]
+        return lambda seq: (seq[index],)
+    if len(indices) == 0:
+        return lambda seq: ()
+    return operator.itemgetter(*indices)
+
+# Seats (or cells) per gatherer in _SeatKernel, and how many indices it keeps
+# gatherers for: up to about 50MB of them.
+_BLOCK = 1 << 14
+_KEPT = 1 << 20
+
+def _visible_slots(visibility: Visibility, lo: int, hi: int) -> array:
+    """
+    Flat indices of the seats visible from seats [lo, hi), padded out to eight
+    slots per seat with index 0 (padding, so always floor). Laid out a block of
+    _BLOCK seats at a time, and slot-major within a block, so that each slot of
+    a block is one contiguous run.
+    """
+    slots = array('i')
+    seats = visibility.seats
+    offsets = visibility.offsets
+    neighbours = visibility.neighbours
+    for start in range(lo, hi, _BLOCK):
+        stop = min(start + _BLOCK, hi)
+        n = stop - start
+        block = array('i', [0]) * (8 * n)
+        for k in range(start, stop):
+            for slot, j in enumerate(neighbours[offsets[k]:offsets[k + 1]]):
+                block[slot * n + k - start] = seats[j]
+        slots += block
+    return slots
+
+def _step_seats(cells: Sequence[int], seats, slots, n: int, table: bytes) -> bytes:
+    """
+    Next states of n seats, given gatherers for their flat indices and their
+    visible slots (see _visible_slots).
+    """
+    if n == 0:
+        return b''
+
+    states = bytes(seats(cells))
+    seen = bytes(slots(cells)).translate(_FULL)
+    counts = 0
+    for start in range(0, 8 * n, n):
+        counts += int.from_bytes(seen[start:start + n], 'big')
+
+    keys = (int.from_bytes(states, 'big') << 4) + counts
+    return keys.to_bytes(n, 'big').translate(table)
+
+class _SeatKernel:
+    """
+    One line of sight generation, for the cells that scatter covers: scatter
+    holds each cell's seat number, or len(seats) for floor. seats are the flat
+    indices of the seats, and slots what they see (see _visible_slots).
+
+    A gatherer holds every index as a Python int, around ten times the size of
+    the int32 index, so they're built a block at a time. Every generation walks
+    the blocks in order, so instead of a cache that would always miss, those of
+    the first blocks are kept, up to _KEPT indices in all, and the rest are built
+    again each generation and dropped. That bounds the kernel's memory beyond
+    the index itself at the cost of time on boards too big to keep them all.
+    """
+
+    def __init__(self, seats: array, slots: array, scatter: array, table: bytes):
+        self.table = table
+        total = len(seats) + len(slots) + len(scatter)
+        fraction = min(1.0, _KEPT / total) if total else 1.0
+        self._sizes = [min(_BLOCK, len(seats) - lo) for lo in range(0, len(seats), _BLOCK)]
+        self._seats = _Gatherers(seats, _BLOCK, fraction)
+        self._slots = _Gatherers(slots, 8 * _BLOCK, fraction)
+        self._scatter = _Gatherers(scatter, _BLOCK, fraction)
+
+    def __call__(self, cells: Sequence[int]) -> bytes:
+        states = bytearray()
+        for n, seats, slots in zip(self._sizes, self._seats, self._slots):
+            states += _step_seats(cells, seats, slots, n, self.table)
+        states.append(Values.floor) # where scatter points floor cells
+
+        new = bytearray()
+        for scatter in self._scatter:
+            new += bytes(scatter(states))
+        return bytes(new)
+
+class _Gatherers:
+    """Gatherers over each block of an index, the first fraction of them kept."""
+
+    def __init__(self, indices: array, block: int, fraction: float):
+        self.indices = indices
+        self.block = block
+        blocks = -(-len(indices) // block)
+        self.kept = [_gatherer(indices[i * block:(i + 1) * block])
+                     for i in range(int(blocks * fraction))]
+
+    def __iter__(self) -> Iterator[Callable[[Sequence[int]], tuple]]:
+        yield from self.kept
+        block = self.block
+        for start in range(len(self.kept) * block, len(self.indices), block):
+            yield _gatherer(self.indices[start:start + block])
+
+# Input characters to cell codes. Anything else is invalid.
+_INVALID = 255
+_CODES = bytes(
+    {ord('.'): Values.floor, ord('L'): Values.empty, ord('#'): Values.full}.get(i, _INVALID)
+    for i in range(256))
+
+def _load_cells(input_path: str) -> Tuple[bytearray, int, int]:
+    """
+    Load a layout as a padded, flat grid of cell codes, returning (cells,
+    height, width). The padding is included in height and width.
+
+    The file is memory-mapped and each row is translated to cell codes with
+    one bytes.translate call, straight into its place in the grid. No string or
+    list of lines is built, so a huge layout is read in a single pass.
+
+    Raises:
+        ValueError: if the layout is empty, rows differ in width, or contain
+        characters other than '.', 'L' and '#'.
+    """
+    with open(input_path, 'rb') as f, \
+         mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        size = len(m)
+        while size > 0 and m[size - 1] == ord('\n'): # ignore trailing newlines
+            size -= 1
+        if size == 0:
+            raise ValueError(f'{input_path}: empty layout')
+
+        width = m.find(b'\n', 0, size)
+        if width < 0:
+            width = size
+        stride = width + 1 # including newline
+        height = (size + 1) // stride
+        if height * stride != size + 1:
+            raise ValueError(f'{input_path}: rows differ in width')
+
+        padded = width + 2
+        cells = bytearray(padded * (height + 2))
+        for row in range(height):
+            start = row * stride
+            end = start + width
+            if end < size and m[end] != ord('\n'):
+                raise ValueError(f'{input_path}: row {row + 1} differs in width')
+            at = (row + 1) * padded + 1
+            cells[at:at + width] = m[start:end].translate(_CODES)
+
+    if _INVALID in cells:
+        raise ValueError(f'{input_path}: unexpected character in layout')
+
+    return cells, height + 2, padded
+
 class Board:
 
     _directions = [
@@ -52,8 +368,10 @@ class Board:
 
     @classmethod
     def from_file(cls, input_path: str) -> Board:
-        with open(input_path, 'rt') as f:
-            return cls.from_str(f.read())
+        cells, height, width = _load_cells(input_path)
+        values = list(Values)
+        return cls([list(map(values.__getitem__, cells[r * width:(r + 1) * width]))
+                    for r in range(height)])
 
     @classmethod
     def from_str(cls, state: str) -> Board:
@@ -72,10 +390,12 @@ class Board:
 
         return cls(matrix)
 
-    def __init__(self, matrix: Matrix):
+    def __init__(self, matrix: Matrix,
+                 indexes: Optional[Dict[Neighbourhood, Visibility]] = None):
         self.matrix = matrix
         self.height = len(matrix)
         self.width = len(matrix[0])
+        self._indexes = dict() if indexes is None else indexes
 
     def __repr__(self):
         return '\n'.join([''.join(map(repr, line)) for line in self.matrix])
@@ -91,47 +411,136 @@ class Board:
                 counter += self.matrix[row][col] == Values.full
         return counter
 
-    def part_one(self) -> int:
-        for _ in range(250): # timeout after 250 steps
-            n = self._step(Part.one)
-            if n == self:
-                return n.occupied
-            else:
-                self = n
-        raise RuntimeError('time out')
+    @property
+    def visibility(self) -> Visibility:
+        return self.index(Neighbourhood.line_of_sight)
+
+    def index(self, neighbourhood: Neighbourhood) -> Visibility:
+        """Built on first use, then shared by every following generation."""
+        if neighbourhood not in self._indexes:
+            cells = [v for row in self.matrix for v in row]
+            self._indexes[neighbourhood] = _build_visibility(
+                cells, self.height, self.width, neighbourhood == Neighbourhood.adjacent)
+        return self._indexes[neighbourhood]
+
+    def part_one(self, engine: Engine = Engine.matrix,
+                 max_steps: Optional[int] = MAX_STEPS, workers: int = 1) -> int:
+        """
+        Run part one's rules until nothing changes, and count occupied seats.
+
+        max_steps limits the number of generations (None for unlimited), after
+        which RuntimeError is raised, as it is if the board settles into a
+        cycle instead. Every engine behaves the same here. workers > 1 splits
+        each generation across that many processes, and requires Engine.array.
+        """
+        return self.run(RULES[Part.one], engine, max_steps, workers)
+
+    def part_two(self, verbose: bool = False, engine: Engine = Engine.matrix,
+                 max_steps: Optional[int] = MAX_STEPS, workers: int = 1) -> int:
+        """As part_one, with part two's rules."""
+        return self.run(RULES[Part.two], engine, max_steps, workers, verbose)
+
+    def run(self, rule: Rule, engine: Engine = Engine.matrix,
+            max_steps: Optional[int] = MAX_STEPS, workers: int = 1,
+            verbose: bool = False) -> int:
+        """As part_one, with any rules."""
+        if workers > 1:
+            if engine != Engine.array:
+                raise ValueError(f'workers={workers} requires Engine.array')
+            return TiledBoard(ArrayBoard.from_board(self), workers).run(rule, max_steps)
+        if engine == Engine.array:
+            return ArrayBoard.from_board(self).run(rule, max_steps)
+        if engine == Engine.frontier:
+            return FrontierBoard.from_board(self, rule).run(max_steps)
+        if engine == Engine.bits:
+            return BitBoard.from_board(self).run(rule, max_steps)
+
+        return self._simulate(rule, max_steps, verbose)
+
+    def simulate(self, rule: Union[Part, Rule], max_steps: Optional[int] = MAX_STEPS,
+                 history: int = 1024) -> Result:
+        """
+        Run until the board reaches a fixed point or a cycle, reporting which.
+        See FrontierBoard.simulate.
+        """
+        return FrontierBoard.from_board(self, rule).simulate(max_steps, history)
+
+    def _simulate(self, rule: Rule, max_steps: Optional[int],
+                  verbose: bool = False) -> int:
+        """
+        Double buffered: each generation is written over the one before last,
+        so no matter how many steps it takes, only two grids are ever allocated.
+        The board itself is left untouched.
+        """
+        step = self._compile(rule)
+        current = [row[:] for row in self.matrix]
+        spare = [row[:] for row in self.matrix] # floor is already in place
 
-    def part_two(self, verbose: bool = False) -> int:
         if verbose:
             print(self)
 
-        for _ in range(250): # timeout after 250 steps
-            n = self._step(Part.two)
+        history = _History()
+        history.repeat(hash(bytes(chain.from_iterable(current))), 0)
+        steps = 0
+        while max_steps is None or steps < max_steps:
+            changed = step(current, spare)
+            current, spare = spare, current
+            steps += 1
+
             if verbose:
                 print('-----')
-                print(n)
+                print(Board(current))
 
-            if n == self:
-                return n.occupied
-            else:
-                self = n
+            if not changed:
+                return Board(current).occupied
+            period = history.repeat(hash(bytes(chain.from_iterable(current))), steps)
+            if period:
+                raise RuntimeError(f'cycle of length {period}')
         raise RuntimeError('time out')
 
-
-    def _step(self, part: Part) -> Board:
+    def _step(self, rule: Union[Part, Rule]) -> Board:
         new_matrix = []
         for h in range(self.height):
             new_matrix.append([Values.floor] * self.width)
 
-        for row in range(1, self.height - 1):
-            for col in range(1, self.width - 1):
-                if part == Part.one:
-                    new_matrix[row][col] = self._convolve(row, col, self.matrix)
-                elif part == Part.two:
-                    new_matrix[row][col] = self._raycast(row, col, self.matrix)
-                else:
-                    raise ValueError
+        self._compile(_rule(rule))(self.matrix, new_matrix)
+        return Board(new_matrix, self._indexes)
+
+    def _compile(self, rule: Rule) -> Callable[[Matrix, Matrix], bool]:
+        """
+        Step function for rule. It writes the generation after its first
+        argument into its second, which must have floor in the same places, and
+        returns whether any seat changed.
+        """
+        index = self.index(rule.neighbourhood)
+        table = rule.table()
+        return lambda m, out: self._gather(index, table, m, out)
+
+    def _gather(self, index: Visibility, table: bytes, m: Matrix, out: Matrix) -> bool:
+        """
+        Same rules as _convolve (part one) and _raycast (part two), or any
+        other, by counting through the neighbourhood index.
+        """
+        w = self.width
+        values = list(Values)
+        full = [m[i // w][i % w] == Values.full for i in index.seats]
+        offsets = index.offsets
+        neighbours = index.neighbours
 
-        return Board(new_matrix)
+        changed = False
+        for k, i in enumerate(index.seats):
+            sum_ = 0
+            for j in neighbours[offsets[k]:offsets[k + 1]]:
+                sum_ += full[j]
+
+            row, col = divmod(i, w)
+            v = m[row][col]
+            new = table[v << 4 | sum_]
+            if new != v:
+                changed = True
+                v = values[new]
+            out[row][col] = v
+        return changed
 
     @staticmethod
     def _convolve(row: int, col: int, m: Matrix) -> Values:
@@ -191,6 +600,567 @@ class Board:
             return m[row][col]
 
 
+class ArrayBoard:
+    """
+    Array backed alternative to Board, producing identical results.
+
+    Cells are stored row-major in one flat bytearray (including the floor
+    padding), using the Values codes. Rather than visiting each cell, a
+    generation is computed a whole grid at a time: the bytes are read as one
+    big integer, so adding together the eight shifted copies of the occupied
+    mask sums every cell's adjacent neighbours at once (each byte is a lane,
+    and no lane can exceed 8, so nothing carries). The cell code is packed next
+    to its count in the same way, and bytes.translate applies the rules.
+
+    For line of sight, the seats and the seats they can see are gathered into
+    contiguous runs (one per direction), summed in the same way, and scattered
+    back into the grid. Its int32 index and slots come to about 80 bytes per
+    seat (48MB for a 1000x1000 layout), plus up to about 50MB of gatherers (see
+    _SeatKernel); the benchmark's compile records report it.
+    """
+
+    @classmethod
+    def from_file(cls, input_path: str) -> ArrayBoard:
+        return cls(*_load_cells(input_path))
+
+    @classmethod
+    def from_board(cls, board: Board) -> ArrayBoard:
+        cells = bytearray(v for row in board.matrix for v in row)
+        return cls(cells, board.height, board.width, board._indexes)
+
+    def __init__(self, cells: bytearray, height: int, width: int,
+                 indexes: Optional[Dict[Neighbourhood, Visibility]] = None):
+        self.cells = cells
+        self.height = height
+        self.width = width
+        self._indexes = dict() if indexes is None else indexes
+
+    def __eq__(self, other: ArrayBoard) -> bool:
+        return self.cells == other.cells
+
+    @property
+    def occupied(self) -> int:
+        return self.cells.count(Values.full)
+
+    @property
+    def visibility(self) -> Visibility:
+        return self.index(Neighbourhood.line_of_sight)
+
+    def index(self, neighbourhood: Neighbourhood) -> Visibility:
+        if neighbourhood not in self._indexes:
+            self._indexes[neighbourhood] = _build_visibility(
+                self.cells, self.height, self.width, neighbourhood == Neighbourhood.adjacent)
+        return self._indexes[neighbourhood]
+
+    def to_board(self) -> Board:
+        values = list(Values)
+        w = self.width
+        return Board([[values[c] for c in self.cells[r * w:(r + 1) * w]]
+                      for r in range(self.height)])
+
+    def part_one(self, max_steps: Optional[int] = MAX_STEPS) -> int:
+        return self.run(RULES[Part.one], max_steps)
+
+    def part_two(self, max_steps: Optional[int] = MAX_STEPS) -> int:
+        return self.run(RULES[Part.two], max_steps)
+
+    def run(self, rule: Rule, max_steps: Optional[int] = MAX_STEPS) -> int:
+        """Double buffered, and watching for cycles, like Board._simulate."""
+        step = self._compile(rule)
+        current = bytearray(self.cells)
+        spare = bytearray(len(current))
+
+        history = _History()
+        history.repeat(hash(bytes(current)), 0)
+        steps = 0
+        while max_steps is None or steps < max_steps:
+            spare[:] = step(current) # same length, so the buffer is reused
+            steps += 1
+            if spare == current:
+                return current.count(Values.full)
+            current, spare = spare, current
+            period = history.repeat(hash(bytes(current)), steps)
+            if period:
+                raise RuntimeError(f'cycle of length {period}')
+        raise RuntimeError('time out')
+
+    def _step(self, rule: Union[Part, Rule]) -> ArrayBoard:
+        new_cells = bytearray(self._compile(_rule(rule))(self.cells))
+        return ArrayBoard(new_cells, self.height, self.width, self._indexes)
+
+    def _compile(self, rule: Rule) -> Callable[[bytes], bytes]:
+        """Step function for rule, from one generation's cells to the next."""
+        table = rule.table()
+        if rule.neighbourhood == Neighbourhood.adjacent:
+            return lambda cells: self._step_adjacent(table, cells)
+
+        index = self.index(rule.neighbourhood)
+        slots = _visible_slots(index, 0, len(index.seats))
+        return _SeatKernel(index.seats, slots, index.ordinals, table)
+
+    def _step_adjacent(self, table: bytes, cells: bytes) -> bytes:
+        n = len(cells)
+        w = self.width
+
+        # Pad so that every shifted slice stays inside the buffer. Cells on the
+        # border pick up wrapped-around counts, but they are floor and ignore it.
+        full = bytes(w + 1) + cells.translate(_FULL) + bytes(w + 1)
+        counts = 0
+        for dx, dy in Board._directions:
+            start = w + 1 + dy * w + dx
+            counts += int.from_bytes(full[start:start + n], 'big')
+
+        keys = (int.from_bytes(cells, 'big') << 4) + counts
+        return keys.to_bytes(n, 'big').translate(table)
+
+
+class _Band:
+    """
+    Steps rows [first, last) of a padded grid held in shared memory, reading
+    from one buffer and writing to the other. For line of sight, seats are the
+    flat indices of the band's seats and slots what they see (see _visible_slots).
+    """
+
+    def __init__(self, first: int, last: int, width: int, rule: Rule,
+                 seats: Optional[array] = None, slots: Optional[array] = None):
+        self.first = first
+        self.last = last
+        self.width = width
+        self.rule = rule
+        self._table = rule.table()
+
+        if rule.neighbourhood == Neighbourhood.adjacent:
+            # Read one halo row above and below the band
+            self._array = ArrayBoard(bytearray(), last - first + 2, width)
+        else:
+            # Its view can reach anywhere on the grid, so gather by flat index
+            local = array('i', [len(seats)]) * ((last - first) * width)
+            for k, flat in enumerate(seats):
+                local[flat - first * width] = k
+
+            self._kernel = _SeatKernel(seats, slots, local, self._table)
+
+    @staticmethod
+    def index(visibility: Visibility, first: int, last: int, width: int) -> Tuple[array, array]:
+        """
+        The seats and slots of rows [first, last). Seats are numbered row-major,
+        so the band's seats are contiguous.
+        """
+        seats = visibility.seats
+        lo = bisect_left(seats, first * width)
+        hi = bisect_left(seats, last * width)
+        return seats[lo:hi], _visible_slots(visibility, lo, hi)
+
+    def step(self, src: memoryview, dst: memoryview) -> Tuple[bool, int]:
+        """Whether the band changed, and the hash of its new rows."""
+        w = self.width
+        start = self.first * w
+        stop = self.last * w
+
+        if self.rule.neighbourhood == Neighbourhood.adjacent:
+            new = self._array._step_adjacent(self._table, bytes(src[start - w:stop + w]))[w:-w]
+        else:
+            new = self._kernel(src)
+
+        dst[start:stop] = new
+        return new != src[start:stop], hash(new)
+
+
+def _band_worker(conn: Connection, names: List[str], *band_args):
+    """
+    A TiledBoard worker, which owns one band. Each generation it receives
+    which buffer is current and replies with _Band.step's result, until it
+    receives None.
+    """
+    buffers = [shared_memory.SharedMemory(name=n) for n in names]
+    band = _Band(*band_args)
+    try:
+        for current in iter(conn.recv, None):
+            conn.send(band.step(buffers[current].buf, buffers[1 - current].buf))
+    finally:
+        for shm in buffers:
+            shm.close()
+
+
+class TiledBoard:
+    """
+    Runs ArrayBoard's kernels in parallel, over bands of rows.
+
+    Both generations live in shared memory, and each worker owns one band for
+    the whole run, so each generation the workers only receive which buffer is
+    current, and only return whether anything in their band changed (and its
+    hash, so the board can spot a cycle like the other engines). Adjacent
+    rules read a halo row either side of the band; line of sight can reach
+    anywhere, so each band gathers straight from the whole shared grid, and its
+    worker is sent only its own band's part of the index.
+    """
+
+    def __init__(self, board: ArrayBoard, workers: int):
+        self.board = board
+        self.workers = workers
+
+    def part_one(self, max_steps: Optional[int] = MAX_STEPS) -> int:
+        return self.run(RULES[Part.one], max_steps)
+
+    def part_two(self, max_steps: Optional[int] = MAX_STEPS) -> int:
+        return self.run(RULES[Part.two], max_steps)
+
+    def bands(self) -> List[Tuple[int, int]]:
+        """Interior rows, split as evenly as possible, one band per worker."""
+        rows = self.board.height - 2
+        count = max(1, min(self.workers, rows))
+        edges = [1 + rows * i // count for i in range(count + 1)]
+        return list(zip(edges[:-1], edges[1:]))
+
+    def run(self, rule: Rule, max_steps: Optional[int] = MAX_STEPS) -> int:
+        board = self.board
+        n = len(board.cells)
+        index = None
+        if rule.neighbourhood != Neighbourhood.adjacent:
+            index = board.index(rule.neighbourhood)
+        buffers = [shared_memory.SharedMemory(create=True, size=max(n, 1)) for _ in range(2)]
+        conns: List[Connection] = []
+        processes: List[Process] = []
+        try:
+            for shm in buffers:
+                shm.buf[:n] = board.cells # floor and padding never change
+
+            names = [shm.name for shm in buffers]
+            for first, last in self.bands():
+                band_args = (first, last, board.width, rule)
+                if index is not None:
+                    band_args += _Band.index(index, first, last, board.width)
+                conn, worker_conn = Pipe()
+                process = Process(target=_band_worker, args=(worker_conn, names, *band_args),
+                                  daemon=True)
+                process.start()
+                worker_conn.close()
+                conns.append(conn)
+                processes.append(process)
+            del index # the workers have their parts
+
+            # Each band is always hashed by the same worker, so the hashes of
+            # a generation's bands stand for the whole generation.
+            history = _History()
+            current = 0
+            steps = 0
+            while max_steps is None or steps < max_steps:
+                for conn in conns:
+                    conn.send(current)
+                changed, hashes = zip(*[conn.recv() for conn in conns])
+                current = 1 - current
+                steps += 1
+                if not any(changed):
+                    return bytes(buffers[current].buf[:n]).count(Values.full)
+                period = history.repeat(hash(hashes), steps)
+                if period:
+                    raise RuntimeError(f'cycle of length {period}')
+            raise RuntimeError('time out')
+        finally:
+            # Later workers inherit the earlier pipes, so closing is no signal
+            for conn in conns:
+                try:
+                    conn.send(None)
+                except BrokenPipeError:
+                    pass # that worker has already died
+                conn.close()
+            for process in processes:
+                process.join()
+            for shm in buffers:
+                shm.close()
+                shm.unlink()
+
+
+# Cell codes to ASCII binary digits, for each bitplane, and back again.
+_SEAT_DIGITS = bytes.maketrans(bytes([Values.floor, Values.empty, Values.full]), b'011')
+_FULL_DIGITS = bytes.maketrans(bytes([Values.floor, Values.empty, Values.full]), b'001')
+_DIGIT_VALUES = bytes.maketrans(b'01', bytes([0, 1]))
+
+
+class BitBoard:
+    """
+    Bit-packed alternative to Board, for rules with the adjacent neighbourhood.
+
+    The grid is held as two bitplanes, each one Python int in which bit i is
+    flat index i of the padded grid: one marks seats, the other occupied seats.
+    A generation shifts the occupied plane once per direction and feeds each
+    shifted copy through a bit-sliced counter, so every cell is counted at once,
+    a machine word at a time. A 100M cell board needs about 25MB for its planes
+    (plus a handful of temporary planes while stepping). Loading and converting
+    go through a byte per cell (from_cells and to_cells build the grid, its
+    digit string and a reversed copy), so they peak at a few hundred MB there.
+    """
+
+    @classmethod
+    def from_file(cls, input_path: str) -> BitBoard:
+        return cls.from_cells(*_load_cells(input_path))
+
+    @classmethod
+    def from_board(cls, board: Board) -> BitBoard:
+        return cls.from_cells(ArrayBoard.from_board(board).cells, board.height, board.width)
+
+    @classmethod
+    def from_cells(cls, cells: bytes, height: int, width: int) -> BitBoard:
+        # int(digits, 2) reads most significant first, so reverse the grid
+        seats = int(cells[::-1].translate(_SEAT_DIGITS), 2)
+        full = int(cells[::-1].translate(_FULL_DIGITS), 2)
+        return cls(seats, full, height, width)
+
+    def __init__(self, seats: int, full: int, height: int, width: int):
+        self.seats = seats
+        self.full = full
+        self.height = height
+        self.width = width
+
+    def __eq__(self, other: BitBoard) -> bool:
+        return self.seats == other.seats and self.full == other.full
+
+    @property
+    def occupied(self) -> int:
+        return self.full.bit_count()
+
+    def to_cells(self) -> bytearray:
+        n = self.height * self.width
+        seats = format(self.seats, f'0{n}b')[::-1].encode().translate(_DIGIT_VALUES)
+        full = format(self.full, f'0{n}b')[::-1].encode().translate(_DIGIT_VALUES)
+        # empty is 1 and full is 2, so the code is the sum of the two planes
+        codes = int.from_bytes(seats, 'big') + int.from_bytes(full, 'big')
+        return bytearray(codes.to_bytes(n, 'big'))
+
+    def to_board(self) -> Board:
+        return ArrayBoard(self.to_cells(), self.height, self.width).to_board()
+
+    def part_one(self, max_steps: Optional[int] = MAX_STEPS) -> int:
+        return self.run(RULES[Part.one], max_steps)
+
+    def run(self, rule: Rule, max_steps: Optional[int] = MAX_STEPS) -> int:
+        """
+        Occupied seats once the board stops changing. The planes are hashed as
+        bytes to spot cycles: hash() of an int is its value mod 2**61 - 1, so
+        seats 61 cells apart would collide.
+        """
+        step = self._compile(rule)
+        size = (self.height * self.width + 7) // 8
+        full = self.full
+        history = _History()
+        history.repeat(hash(full.to_bytes(size, 'little')), 0)
+        steps = 0
+        while max_steps is None or steps < max_steps:
+            new_full = step(full)
+            steps += 1
+            if new_full == full:
+                return full.bit_count()
+            full = new_full
+            period = history.repeat(hash(full.to_bytes(size, 'little')), steps)
+            if period:
+                raise RuntimeError(f'cycle of length {period}')
+        raise RuntimeError('time out')
+
+    def _step(self, rule: Union[Part, Rule]) -> BitBoard:
+        full = self._compile(_rule(rule))(self.full)
+        return BitBoard(self.seats, full, self.height, self.width)
+
+    def _compile(self, rule: Rule) -> Callable[[int], int]:
+        """Step function for rule, from one occupied plane to the next."""
+        if rule.neighbourhood != Neighbourhood.adjacent:
+            raise ValueError('Engine.bits only supports the adjacent neighbourhood')
+
+        seats = self.seats
+        birth = rule.birth + 1
+        death = rule.death
+
+        def step(full: int) -> int:
+            counts = self._count(full)
+            crowded = self._at_least(counts, death)
+            lonely = ~self._at_least(counts, birth)
+            return (full & ~crowded) | (seats & ~full & lonely)
+
+        return step
+
+    def _count(self, full: int) -> Tuple[int, int, int, int]:
+        """
+        Occupied neighbours of every cell, as a bit-sliced counter: bit i of
+        the returned planes is the binary count for cell i, least significant
+        plane first.
+        """
+        w = self.width
+
+        s0 = s1 = s2 = s3 = 0
+        for shift in (1, w - 1, w, w + 1):
+            for plane in (full >> shift, full << shift):
+                carry = s0 & plane
+                s0 ^= plane
+                plane = carry
+                carry = s1 & plane
+                s1 ^= plane
+                plane = carry
+                carry = s2 & plane
+                s2 ^= plane
+                s3 |= carry
+
+        return s0, s1, s2, s3
+
+    @staticmethod
+    def _at_least(counts: Tuple[int, int, int, int], threshold: int) -> int:
+        """Plane of the cells whose count is at least threshold."""
+        if threshold <= 0:
+            return -1 # every bit set
+        if threshold >= 16:
+            return 0
+
+        # Compare from the most significant plane down, tracking the cells
+        # whose count so far equals the threshold's leading bits.
+        result = 0
+        equal = -1
+        for bit in range(3, -1, -1):
+            plane = counts[bit]
+            if threshold >> bit & 1:
+                equal &= plane
+            else:
+                result |= equal & plane
+                equal &= ~plane
+        return result | equal
+
+
+class StepStats(NamedTuple):
+    generation: int
+    evaluated: int # seats whose rule was checked
+    changed: int
+
+
+class Result(NamedTuple):
+    occupied: int
+    generations: int # steps taken, including the one that closed the cycle
+    cycle: int # period of the state reached; 1 for a fixed point
+
+
+class FrontierBoard:
+    """
+    Incremental simulation, for one rule.
+
+    After the first few generations, almost every seat is stable. A seat can
+    only change if it, or a seat it watches, changed last generation, so only
+    that frontier is re-evaluated. Occupied neighbour counts are kept per seat,
+    and adjusted as seats flip. The simulation has converged once the frontier
+    is empty.
+
+    The state is also hashed (Zobrist style: the XOR of a random 64 bit key
+    per occupied seat), which is updated in O(1) per flip. Looking the hash up
+    in a table of recent generations finds cycles of any period, as well as
+    fixed points.
+    """
+
+    _seed = 11
+
+    @classmethod
+    def from_board(cls, board: Board, rule: Union[Part, Rule]) -> FrontierBoard:
+        rule = _rule(rule)
+        cells = [v for row in board.matrix for v in row]
+        index = board.index(rule.neighbourhood)
+        return cls(cells, board.height, board.width, rule, index)
+
+    def __init__(self, cells: Sequence[int], height: int, width: int,
+                 rule: Rule, index: Visibility):
+        self.height = height
+        self.width = width
+        self.rule = rule
+        self.index = index
+        self.states = bytearray(cells[i] for i in index.seats)
+        self.counts = bytearray(len(self.states))
+        for k, v in enumerate(self.states):
+            if v == Values.full:
+                for j in self._neighbours(k):
+                    self.counts[j] += 1
+
+        self.table = rule.table()
+        self.frontier = range(len(self.states))
+        self.stats: List[StepStats] = []
+
+        rng = random.Random(self._seed)
+        self.keys = array('Q', (rng.getrandbits(64) for _ in self.states))
+        self.hash = 0
+        for k, v in enumerate(self.states):
+            if v == Values.full:
+                self.hash ^= self.keys[k]
+
+    @property
+    def occupied(self) -> int:
+        return self.states.count(Values.full)
+
+    @property
+    def converged(self) -> bool:
+        return len(self.frontier) == 0
+
+    def to_board(self) -> Board:
+        cells = bytearray(self.height * self.width)
+        for i, v in zip(self.index.seats, self.states):
+            cells[i] = v
+        return ArrayBoard(cells, self.height, self.width).to_board()
+
+    def run(self, max_steps: Optional[int] = MAX_STEPS) -> int:
+        """
+        Occupied seats once the board stops changing.
+
+        Raises:
+            RuntimeError: if the board settles into a cycle instead, or
+            max_steps runs out.
+        """
+        result = self.simulate(max_steps)
+        if result.cycle != 1:
+            raise RuntimeError(f'cycle of length {result.cycle}')
+        return result.occupied
+
+    def simulate(self, max_steps: Optional[int] = MAX_STEPS, history: int = 1024) -> Result:
+        """
+        Step until a state repeats, remembering the hashes of up to history
+        recent generations (see _History).
+
+        Raises:
+            RuntimeError: if max_steps runs out first.
+        """
+        seen = _History(history)
+        seen.repeat(self.hash, len(self.stats))
+        steps = 0
+        while max_steps is None or steps < max_steps:
+            self.step()
+            steps += 1
+            generation = len(self.stats)
+            period = seen.repeat(self.hash, generation)
+            if period:
+                return Result(self.occupied, generation, period)
+        raise RuntimeError('time out')
+
+    def step(self) -> StepStats:
+        states = self.states
+        counts = self.counts
+        table = self.table
+
+        # Decide every flip before applying any, so the update is synchronous
+        flips = [k for k in self.frontier if table[states[k] << 4 | counts[k]] != states[k]]
+
+        frontier = set(flips)
+        keys = self.keys
+        for k in flips:
+            self.hash ^= keys[k]
+            if states[k] == Values.full:
+                states[k] = Values.empty
+                delta = -1
+            else:
+                states[k] = Values.full
+                delta = 1
+
+            for j in self._neighbours(k):
+                counts[j] += delta
+                frontier.add(j)
+
+        stats = StepStats(len(self.stats) + 1, len(self.frontier), len(flips))
+        self.stats.append(stats)
+        self.frontier = frontier
+        return stats
+
+    def _neighbours(self, k: int) -> array:
+        offsets = self.index.offsets
+        return self.index.neighbours[offsets[k]:offsets[k + 1]]
 
 
 if __name__ == '__main__':
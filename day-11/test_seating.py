@@ -1,11 +1,26 @@
+import os
+import tempfile
 import unittest
+from unittest import mock
 
 from seating import Values as V
 from seating import Board
 from seating import Part
+from seating import ArrayBoard
+from seating import Engine
+from seating import FrontierBoard
+from seating import TiledBoard
+from seating import BitBoard
+from seating import Neighbourhood
+from seating import Rule
 
 class TestSeating(unittest.TestCase):
 
+    # Oscillates with period 2 under part one's rules
+    cycle_layout = '\n'.join([
+        'LLLL.LL.LL', '.LLLLLLLLL', 'LLLLLLLLL.', 'LLLLLLL.LL', '.LLLLLLLL.',
+        '.L..LLLLL.', 'LLLL.LLLLL', 'LLLLLL.LLL', 'L.LLLLLLL.', 'LLLLLL.LLL'])
+
     def test_from_file(self):
         board = Board.from_file('small_test_input_0')
         expected = [
@@ -19,6 +34,23 @@ class TestSeating(unittest.TestCase):
         self.assertEqual(len(board.matrix[0]), 5)
         self.assertListEqual(board.matrix, expected)
 
+    def test_from_file_array(self):
+        a = ArrayBoard.from_file('input')
+        b = ArrayBoard.from_board(Board.from_file('input'))
+        self.assertEqual((a.height, a.width), (93 + 2, 97 + 2))
+        self.assertEqual(a.cells, b.cells)
+        self.assertEqual(BitBoard.from_file('input'), BitBoard.from_board(b.to_board()))
+
+    def test_from_file_invalid(self):
+        for layout in ['L.L\nLL\n', 'L.L\nLL\nL.L\n', 'L.L\nLxL\n', '\n']:
+            with tempfile.NamedTemporaryFile('wt', delete=False) as f:
+                f.write(layout)
+            try:
+                with self.assertRaises(ValueError):
+                    Board.from_file(f.name)
+            finally:
+                os.remove(f.name)
+
     def test_convolve_all_floor(self):
         m = [[V.floor, V.floor, V.floor]] * 3
         self.assertEqual(Board._convolve(1, 1, m), V.floor)
@@ -65,6 +97,174 @@ class TestSeating(unittest.TestCase):
         ]
         self.assertEqual(Board._raycast(1, 1, m), V.full)
 
+    def test_array_step_part_one(self):
+        b0 = Board.from_file('small_test_input_0')
+        b1 = Board.from_file('small_test_input_1')
+        b2 = Board.from_file('small_test_input_2')
+
+        t1 = ArrayBoard.from_board(b0)._step(Part.one)
+        self.assertListEqual(t1.to_board().matrix, b1.matrix)
+
+        t2 = t1._step(Part.one)
+        self.assertListEqual(t2.to_board().matrix, b2.matrix)
+
+    def test_array_part_one(self):
+        b = Board.from_file('input')
+        self.assertEqual(b.part_one(Engine.array), b.part_one())
+
+    def test_visibility(self):
+        b = Board.from_str('L.#\n...\n#.L')
+        vis = b.visibility
+        self.assertEqual(list(vis.seats), [6, 8, 16, 18])
+        self.assertEqual(vis.ordinals[8], 1)
+        self.assertEqual(vis.ordinals[7], 4) # floor
+        seen = {k: set(vis.neighbours[vis.offsets[k]:vis.offsets[k + 1]]) for k in range(4)}
+        self.assertEqual(seen, {0: {1, 2, 3}, 1: {0, 2, 3}, 2: {0, 1, 3}, 3: {0, 1, 2}})
+
+    def test_step_part_two_matches_raycast(self):
+        b = Board.from_file('input')._step(Part.one)
+        expected = [[V.floor] * b.width]
+        for row in range(1, b.height - 1):
+            expected.append([V.floor] + [Board._raycast(row, col, b.matrix)
+                                         for col in range(1, b.width - 1)] + [V.floor])
+        expected.append([V.floor] * b.width)
+        self.assertListEqual(b._step(Part.two).matrix, expected)
+
+    def test_array_part_two(self):
+        b = Board.from_file('input')
+        self.assertEqual(b.part_two(engine=Engine.array), b.part_two())
+
+    def test_frontier_step_part_one(self):
+        b0 = Board.from_file('small_test_input_0')
+        b1 = Board.from_file('small_test_input_1')
+        b2 = Board.from_file('small_test_input_2')
+
+        f = FrontierBoard.from_board(b0, Part.one)
+        self.assertEqual(f.step(), (1, 5, 1))
+        self.assertListEqual(f.to_board().matrix, b1.matrix)
+        f.step()
+        self.assertListEqual(f.to_board().matrix, b2.matrix)
+
+    def test_frontier_part_one(self):
+        b = Board.from_file('input')
+        f = FrontierBoard.from_board(b, Part.one)
+        self.assertEqual(f.run(), 2316)
+        self.assertTrue(f.converged)
+        self.assertEqual(f.stats[-1].changed, 0)
+        self.assertLess(f.stats[-1].evaluated, f.stats[0].evaluated)
+
+    def test_frontier_part_two(self):
+        b = Board.from_file('input')
+        self.assertEqual(b.part_two(engine=Engine.frontier), b.part_two())
+
+    def test_array_part_two_in_blocks(self):
+        # Many blocks, with gatherers kept for none, some or all of them
+        for kept in (0, 10000, 100000):
+            with self.subTest(kept=kept), \
+                 mock.patch('seating._BLOCK', 100), mock.patch('seating._KEPT', kept):
+                self.assertEqual(ArrayBoard.from_file('input').part_two(), 2128)
+
+    def test_max_steps(self):
+        b = Board.from_file('input')
+        for engine in Engine:
+            with self.assertRaises(RuntimeError):
+                b.part_one(engine=engine, max_steps=10)
+        self.assertEqual(b.part_one(engine=Engine.array, max_steps=None), 2316)
+
+    def test_never_settles(self):
+        b = Board.from_str(self.cycle_layout)
+        for engine in Engine:
+            with self.subTest(engine=engine):
+                with self.assertRaisesRegex(RuntimeError, 'cycle of length 2'):
+                    b.part_one(engine=engine)
+        with self.assertRaisesRegex(RuntimeError, 'cycle of length 2'):
+            b.part_one(engine=Engine.array, workers=2)
+
+    def test_part_one_leaves_board_alone(self):
+        a = Board.from_file('small_test_input_0')
+        a.part_one()
+        self.assertTrue(a == Board.from_file('small_test_input_0'))
+
+    def test_tiled_bands(self):
+        b = ArrayBoard.from_board(Board.from_file('input'))
+        self.assertEqual(TiledBoard(b, 3).bands(), [(1, 32), (32, 63), (63, 94)])
+
+    def test_tiled(self):
+        b = Board.from_file('input')
+        self.assertEqual(b.part_one(engine=Engine.array, workers=3), 2316)
+        self.assertEqual(b.part_two(engine=Engine.array, workers=3), 2128)
+        with self.assertRaises(ValueError):
+            b.part_one(workers=2)
+
+    def test_bits_round_trip(self):
+        b = Board.from_file('small_test_input_1')
+        bits = BitBoard.from_board(b)
+        self.assertEqual(bits.seats, sum(1 << i for i in [7, 12, 13, 16, 18]))
+        self.assertEqual(bits.occupied, 3)
+        self.assertListEqual(bits.to_board().matrix, b.matrix)
+
+    def test_bits_step_part_one(self):
+        b0 = Board.from_file('small_test_input_0')
+        b1 = Board.from_file('small_test_input_1')
+        b2 = Board.from_file('small_test_input_2')
+
+        t1 = BitBoard.from_board(b0)._step(Part.one)
+        self.assertListEqual(t1.to_board().matrix, b1.matrix)
+
+        t2 = t1._step(Part.one)
+        self.assertListEqual(t2.to_board().matrix, b2.matrix)
+
+    def test_bits_part_one(self):
+        b = Board.from_file('input')
+        self.assertEqual(b.part_one(engine=Engine.bits), 2316)
+        with self.assertRaises(ValueError):
+            b.part_two(engine=Engine.bits)
+
+    def test_simulate_fixed_point(self):
+        b = Board.from_file('input')
+        result = b.simulate(Part.one)
+        self.assertEqual(result, (2316, 108, 1))
+
+    def test_simulate_cycle(self):
+        b = Board.from_str(self.cycle_layout)
+        result = b.simulate(Part.one)
+        self.assertEqual(result.cycle, 2)
+
+        a = ArrayBoard.from_board(b)
+        for _ in range(result.generations - 2):
+            a = a._step(Part.one)
+        self.assertTrue(a == a._step(Part.one)._step(Part.one))
+        self.assertFalse(a == a._step(Part.one))
+
+        with self.assertRaises(RuntimeError):
+            b.part_one(engine=Engine.frontier)
+
+    def test_rule_table(self):
+        table = Rule(Neighbourhood.adjacent, birth=1, death=3).table()
+        self.assertEqual(table[V.empty << 4 | 1], V.full)
+        self.assertEqual(table[V.empty << 4 | 2], V.empty)
+        self.assertEqual(table[V.full << 4 | 2], V.full)
+        self.assertEqual(table[V.full << 4 | 3], V.empty)
+        self.assertEqual(table[V.floor << 4 | 0], V.floor)
+
+    def test_custom_rule(self):
+        b = Board.from_file('input')
+        rule = Rule(Neighbourhood.line_of_sight, birth=0, death=6)
+        self.assertEqual(b.simulate(rule), (3112, 42, 1))
+        self.assertEqual(b.run(rule), 3112)
+        self.assertEqual(b.run(rule, engine=Engine.array), 3112)
+        self.assertEqual(b.run(rule, engine=Engine.array, workers=2), 3112)
+
+    def test_custom_rule_bits(self):
+        b = Board.from_file('input')
+        rule = Rule(Neighbourhood.adjacent, birth=1, death=5)
+        a = ArrayBoard.from_board(b)
+        bits = BitBoard.from_board(b)
+        for _ in range(5):
+            a = a._step(rule)
+            bits = bits._step(rule)
+            self.assertEqual(bits.to_cells(), a.cells)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
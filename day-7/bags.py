@@ -6,10 +6,15 @@ https://adventofcode.com/2020/day/7
 
 from __future__ import annotations
 
+import re
 import unittest
 
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from itertools import accumulate
 from pathlib import Path
-from typing import Dict, Optional, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 from warnings import warn
 
 class TestHandyHaversacks(unittest.TestCase):
@@ -51,20 +56,101 @@ class TestHandyHaversacks(unittest.TestCase):
         self.assertTrue(shiny_gold in bright_white._children)
         self.assertEqual(bright_white._children[shiny_gold], 1)
 
+    def test_parse_chunks(self):
+        # Chunks smaller than a line must not split rules
+        small = HandyHaversacks()
+        small._parse_input('test_input_one', chunk_size=7)
+        handy = HandyHaversacks()
+        for line in open('test_input_one'):
+            handy._parse_line(line)
+
+        self.assertEqual(list(small.bags), list(handy.bags))
+        for name, bag in handy.bags.items():
+            self.assertEqual({b.name: n for b, n in small.bags[name]._children.items()},
+                             {b.name: n for b, n in bag._children.items()})
+
     def test_part_one(self):
         handy = HandyHaversacks()
         result = handy.part_one(Path('test_input_one'))
         self.assertEqual(result, 4)
 
+    def test_containers_of(self):
+        handy = HandyHaversacks()
+        handy._parse_input('test_input_one')
+        self.assertEqual(handy.containers_of('shiny gold'),
+                         {'bright white', 'muted yellow', 'dark orange', 'light red'})
+        self.assertEqual(handy.containers_of('bright white'), {'dark orange', 'light red'})
+        self.assertEqual(handy.containers_of('light red'), set())
+        self.assertFalse(any(bag.is_final for bag in handy.bags.values()))
+
+    def test_edit_rules(self):
+        handy = HandyHaversacks()
+        handy._parse_input('test_input_one')
+        handy.add_rule('posh teal bags contain 1 bright white bag, 2 muted yellow bags.')
+        self.assertIn('posh teal', handy.containers_of('shiny gold'))
+
+        handy.remove_rule('bright white')
+        self.assertEqual(handy.containers_of('shiny gold'),
+                         {'muted yellow', 'dark orange', 'light red', 'posh teal'})
+        self.assertEqual(handy.containers_of('bright white'),
+                         {'dark orange', 'light red', 'posh teal'})
+
+        with self.assertRaises(ValueError):
+            handy.add_rule('no other bags.')
+
+    def test_edit_then_parse(self):
+        handy = HandyHaversacks()
+        handy._parse_input('test_input_one')
+        handy.add_rule('posh teal bags contain 1 bright white bag.')
+        handy._parse_chunk('posh teal bags contain 2 dotted black bags.\n'
+                           'posh teal bags contain 3 bright white bags.\n')
+
+        posh_teal = handy.bags['posh teal']
+        with self.assertWarns(UserWarning):
+            children = {bag.name: n for bag, n in posh_teal._children.items()}
+        self.assertEqual(children, {'bright white': 3, 'dotted black': 2})
+        self.assertIn('posh teal', handy.containers_of('shiny gold'))
+
+    def test_edit_counts(self):
+        handy = HandyHaversacks()
+        self.assertEqual(handy.part_two('test_input_two'), 126)
+        graph = handy.graph
+
+        handy.add_rule('dark blue bags contain 3 dark violet bags.')
+        self.assertIsNone(graph._totals[graph.ids['shiny gold']])
+        self.assertEqual(graph._totals[graph.ids['dark violet']], 0) # below, still known
+        self.assertEqual(handy.bags['shiny gold'].count_children(), 2 + 4 + 8 + 16 + 32 + 96)
+
+        handy.remove_rule('dark red')
+        self.assertEqual(handy.bags['shiny gold'].count_children(), 2)
+        self.assertEqual(handy.bags['dark orange'].count_children(), 2 + 4 + 8 + 24)
+
+        handy._finalize_all()
+        handy.add_rule('dark red bags contain 1 shiny gold bag.')
+        self.assertTrue(handy.bags['dark violet'].is_final)
+        self.assertFalse(handy.bags['dark red'].is_final)
+        with self.assertRaises(ValueError):
+            handy.bags['shiny gold'].count_children()
+
     def test_part_two(self):
         handy = HandyHaversacks()
         result = handy.part_two('test_input_two')
         self.assertEqual(result, 126)
 
+    def test_sparse(self):
+        for sparse in (False, True):
+            handy = HandyHaversacks(sparse)
+            handy._parse_input('test_input_one')
+            handy._finalize_all()
+            shiny_gold = handy.bags['shiny gold']
+            self.assertEqual(shiny_gold.deep_count_all(), 32)
+            self.assertEqual(shiny_gold.deep_count(handy.bags['faded blue']), 3 + 2 * 5)
+
 
 class TestBag(unittest.TestCase):
     def test_finalize(self):
-        bags = [Bag('0'), Bag('1'), Bag('2')]
+        graph = BagGraph()
+        bags = [graph.bag('0'), graph.bag('1'), graph.bag('2')]
         bags[0].add(bags[1], 5)
         bags[1].add(bags[2], 3)
 
@@ -79,110 +165,739 @@ class TestBag(unittest.TestCase):
         self.assertEqual(bags[0]._deep_children[bags[1]], 5)
         self.assertEqual(bags[0]._deep_children[bags[2]], 15) # 5 * 3
 
+    def test_count_children_shared(self):
+        # Each bag holds two of the next, twice over: 2^n paths to the bottom
+        graph = BagGraph()
+        bags = [graph.bag(str(i)) for i in range(101)]
+        for outer, inner in zip(bags, bags[1:]):
+            outer.add(inner, 2)
+        self.assertEqual(bags[0].count_children(), 2 ** 101 - 2)
+
+    def test_finalize_deep_chain(self):
+        graph = BagGraph()
+        bags = [graph.bag(str(i)) for i in range(1500)] # past the default recursion limit
+        for outer, inner in zip(bags, bags[1:]):
+            outer.add(inner, 1)
+        bags[0].finalize()
+        self.assertEqual(bags[0].deep_count_all(), 1499)
+        self.assertEqual(bags[0].count_children(), 1499)
+
+    def test_topological_order_cycle(self):
+        graph = BagGraph()
+        bags = [graph.bag('0'), graph.bag('1')]
+        bags[0].add(bags[1], 1)
+        bags[1].add(bags[0], 1)
+        with self.assertRaises(ValueError):
+            graph.topological_order([0, 1])
+
+
+    def test_sparse(self):
+        graph = BagGraph(sparse=True)
+        bags = [graph.bag(str(i)) for i in range(4)]
+        bags[0].add(bags[1], 2)
+        bags[0].add(bags[2], 3)
+        bags[1].add(bags[3], 5)
+        bags[2].add(bags[3], 7)
+
+        self.assertIsNone(bags[0].deep_count(bags[3]))
+        bags[0].finalize()
+        self.assertTrue(bags[0].is_final)
+        self.assertEqual(graph._closures, dict())
+        self.assertEqual(bags[0].deep_count_all(), 2 + 3 + 2 * 5 + 3 * 7)
+        self.assertEqual(bags[0].deep_count(bags[3]), 2 * 5 + 3 * 7)
+        self.assertEqual(bags[1].deep_count(bags[2]), 0)
+        self.assertTrue(bags[0].deep_contains(bags[1]))
+        self.assertFalse(bags[3].deep_contains(bags[0]))
+
+
+class TestBagQueries(unittest.TestCase):
+    def test_queries(self):
+        queries = BagQueries.from_file('test_input_two')
+        self.assertEqual(queries.deep_count_all('shiny gold'), 126)
+        self.assertEqual(queries.deep_count('shiny gold', 'dark orange'), 4)
+        self.assertEqual(queries.deep_count('dark orange', 'shiny gold'), 0)
+        self.assertTrue(queries.can_contain('shiny gold', 'dark violet'))
+        self.assertFalse(queries.can_contain('dark violet', 'shiny gold'))
+        self.assertFalse(queries.can_contain('dark red', 'dark red'))
+        with self.assertRaises(KeyError):
+            queries.deep_count_all('plaid fuchsia')
+
+    def test_cache(self):
+        queries = BagQueries.from_file('test_input_two', maxsize=2)
+        queries.deep_count_all('dark red')
+        self.assertEqual((queries.hits, queries.misses), (0, 1))
+        self.assertEqual(len(queries._cache), 2)
+
+        # Uses the cached dark red, rather than searching below it again
+        self.assertEqual(queries.deep_count_all('shiny gold'), 126)
+        self.assertEqual(list(queries._cache), [queries.graph.ids['dark red'],
+                                                queries.graph.ids['shiny gold']])
+        queries.deep_count('shiny gold', 'dark blue')
+        self.assertEqual((queries.hits, queries.misses), (1, 2))
+
+        ids = queries.graph.ids
+        queries.graph.set_children(ids['dark blue'], {ids['dark violet']: 3})
+        self.assertEqual(queries.deep_count_all('shiny gold'), 158)
+        self.assertEqual(queries.misses, 3)
+
+
+class TestBagGraph(unittest.TestCase):
+    def test_compile(self):
+        graph = BagGraph()
+        a, b, c = (graph.intern(name) for name in 'abc')
+        graph.add(a, c, 2)
+        graph.add(b, c, 3)
+        graph.add(a, b, 1)
+
+        self.assertEqual(sorted(graph.children_of(a)), [(b, 1), (c, 2)])
+        self.assertEqual(list(graph.children_of(c)), [])
+        self.assertEqual(sorted(graph.parents_of(c)), [a, b])
+        self.assertEqual(graph.total(a), 1 + 3 + 2)
+
+    def test_duplicate_rule(self):
+        graph = BagGraph()
+        a, b = graph.intern('a'), graph.intern('b')
+        graph.add(a, b, 2)
+        graph.add(a, b, 5)
+        with self.assertWarns(UserWarning):
+            self.assertEqual(list(graph.children_of(a)), [(b, 5)])
+        self.assertEqual(list(graph.parents_of(b)), [a])
+
+
+class BagGraph:
+    """
+    Containment rules, stored compactly.
+
+    Colour names are interned to dense integer ids, and each rule is appended
+    to flat edge arrays as it's parsed. On first use the edges are compiled
+    into compressed sparse row form, in both directions: the bags directly
+    inside bag i are children[offsets[i]:offsets[i+1]] (with matching counts),
+    and the bags directly containing it are
+    parents[parent_offsets[i]:parent_offsets[i+1]].
+
+    Rules changed after that are kept as overrides on top of the arrays (see
+    set_children), and folded in if the arrays are ever rebuilt.
+
+    A sparse graph memoizes only each bag's total; how many of one bag are
+    inside another is then worked out when asked (see path_count), rather
+    than keeping every bag's full contents.
+
+    Bag objects are just views of an id in a graph.
+    """
+
+    def __init__(self, sparse: bool = False):
+        self.sparse = sparse
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = dict()
+
+        # Rules in the order they were added
+        self._outer = array('i')
+        self._inner = array('i')
+        self._count = array('l')
+        self._compiled = False
+
+        self.offsets = array('l', [0])
+        self.children = array('i')
+        self.counts = array('l')
+        self.parent_offsets = array('l', [0])
+        self.parents = array('i')
+
+        # Bags whose rules changed since compiling: {outer: {inner: count}},
+        # and the complete parents of bags whose parents changed
+        self._overrides: Dict[int, Dict[int, int]] = dict()
+        self._parent_overrides: Dict[int, Set[int]] = dict()
+        self.edits = 0
+
+        # Memos, by id
+        self._totals: List[Optional[int]] = []
+        self._closures: Dict[int, Dict[int, int]] = dict()
+        self._memoized = False
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def intern(self, name: str) -> int:
+        """Id of the named bag, adding it if it's new."""
+        id_ = self.ids.get(name)
+        if id_ is None:
+            id_ = len(self.names)
+            self.ids[name] = id_
+            self.names.append(name)
+            self._totals.append(None)
+            if self._compiled: # past the end of the arrays
+                self._overrides[id_] = dict()
+                self._parent_overrides[id_] = set()
+        return id_
+
+    def bag(self, name: str) -> Bag:
+        return Bag(self, self.intern(name))
+
+    def add(self, outer: int, inner: int, count: int):
+        """Record that outer directly contains count inner bags."""
+        if self._compiled:
+            children = dict(self.children_of(outer))
+            if inner in children:
+                warn(f'bag "{self.names[inner]}" is already a child in {self.names[outer]}')
+            children[inner] = count
+            self.set_children(outer, children)
+            return
+
+        if self._overrides: # they came first, so must lose to this
+            self._fold_overrides()
+        self._outer.append(outer)
+        self._inner.append(inner)
+        self._count.append(count)
+        self._invalidate()
+
+    def set_children(self, outer: int, children: Dict[int, int]):
+        """
+        Replace outer's rule: it now directly contains children[inner] of each
+        inner bag. Only outer and the bags (eventually) containing it forget
+        what they'd memoized, so an edit costs about as much as the part of the
+        graph above it, and they're recounted when next asked for.
+        """
+        self.compile()
+        old = dict(self.children_of(outer))
+        for inner in old.keys() - children.keys():
+            self._parents_to_edit(inner).discard(outer)
+        for inner in children.keys() - old.keys():
+            self._parents_to_edit(inner).add(outer)
+
+        self._forget(outer)
+        self._overrides[outer] = dict(children)
+        self.edits += 1
+
+    def _parents_to_edit(self, id_: int) -> Set[int]:
+        if id_ not in self._parent_overrides:
+            self._parent_overrides[id_] = set(self.parents_of(id_))
+        return self._parent_overrides[id_]
+
+    def _forget(self, id_: int):
+        """
+        Drop the memos of id_ and every bag containing it. A bag's memos are
+        only made after all of its contents', so the search up can stop at
+        bags without any.
+        """
+        totals = self._totals
+        closures = self._closures
+        seen = {id_}
+        queue = deque([id_])
+        while queue:
+            i = queue.popleft()
+            if totals[i] is None and i not in closures:
+                continue
+
+            totals[i] = None
+            closures.pop(i, None)
+            for parent in self.parents_of(i):
+                if parent not in seen:
+                    seen.add(parent)
+                    queue.append(parent)
+
+    def _invalidate(self):
+        """Anything computed before might now be out of date."""
+        self._compiled = False
+        self.edits += 1
+        if self._memoized:
+            self._totals = [None] * len(self.names)
+            self._closures.clear()
+            self._memoized = False
+
+    def extend(self, outer: array, inner: array, counts: array):
+        """Add many rules at once: outer[e] directly contains counts[e] inner[e] bags."""
+        if self._overrides:
+            self._fold_overrides()
+        self._outer.extend(outer)
+        self._inner.extend(inner)
+        self._count.extend(counts)
+        self._invalidate()
+
+    def compile(self):
+        """Build the compressed sparse row arrays, if they're out of date."""
+        if self._compiled:
+            return
+
+        if self._overrides:
+            self._fold_overrides()
+
+        n = len(self.names)
+        self.offsets, order = self._bucket(self._outer, n)
+        self.children = array('i', [self._inner[e] for e in order])
+        self.counts = array('l', [self._count[e] for e in order])
+        if self._has_duplicates():
+            self._dedupe()
+            return self.compile()
+
+        self.parent_offsets, order = self._bucket(self.children, n)
+        outers = array('i', [0]) * len(self.children)
+        for i in range(n):
+            for e in range(self.offsets[i], self.offsets[i + 1]):
+                outers[e] = i
+        self.parents = array('i', [outers[e] for e in order])
+
+        self._compiled = True
+
+    def _fold_overrides(self):
+        """Rewrite the rules as added, with the overridden ones replaced."""
+        changed = self._overrides
+        keep = [e for e, outer in enumerate(self._outer) if outer not in changed]
+        self._outer, self._inner, self._count = (
+            array(a.typecode, [a[e] for e in keep])
+            for a in (self._outer, self._inner, self._count))
+
+        for outer, children in changed.items():
+            for inner, count in children.items():
+                self._outer.append(outer)
+                self._inner.append(inner)
+                self._count.append(count)
+
+        self._overrides = dict()
+        self._parent_overrides = dict()
+
+    @staticmethod
+    def _bucket(keys: array, n: int):
+        """
+        Counting sort of edge numbers by key, stable. Returns the offsets of
+        each key's run, and the edge numbers in sorted order.
+        """
+        sizes = [0] * (n + 1)
+        for k in keys:
+            sizes[k + 1] += 1
+        offsets = array('l', accumulate(sizes))
+
+        order = array('l', [0]) * len(keys)
+        position = list(offsets[:-1])
+        for e, k in enumerate(keys):
+            order[position[k]] = e
+            position[k] += 1
+        return offsets, order
+
+    def _has_duplicates(self) -> bool:
+        offsets = self.offsets
+        for i in range(len(self.names)):
+            segment = self.children[offsets[i]:offsets[i + 1]]
+            if len(set(segment)) < len(segment):
+                return True
+        return False
+
+    def _dedupe(self):
+        """
+        If a rule was given twice, warn and drop the earlier edge from the
+        staging arrays, so the later count wins.
+        """
+        seen: Set[Tuple[int, int]] = set()
+        keep = bytearray(len(self._outer))
+        for e in reversed(range(len(self._outer))):
+            edge = (self._outer[e], self._inner[e])
+            if edge in seen:
+                warn(f'bag "{self.names[edge[1]]}" is already a child in {self.names[edge[0]]}')
+            else:
+                seen.add(edge)
+                keep[e] = 1
+
+        self._outer, self._inner, self._count = (
+            array(a.typecode, [x for x, k in zip(a, keep) if k])
+            for a in (self._outer, self._inner, self._count))
+
+    def children_of(self, id_: int) -> Iterable[Tuple[int, int]]:
+        """(child id, count) pairs of the bags directly inside."""
+        self.compile()
+        if id_ in self._overrides:
+            return self._overrides[id_].items()
+        start, end = self.offsets[id_], self.offsets[id_ + 1]
+        return zip(self.children[start:end], self.counts[start:end])
+
+    def _child_ids(self, id_: int) -> Iterable[int]:
+        if id_ in self._overrides:
+            return iter(self._overrides[id_])
+        return iter(self.children[self.offsets[id_]:self.offsets[id_ + 1]])
+
+    def parents_of(self, id_: int) -> Iterable[int]:
+        self.compile()
+        if id_ in self._parent_overrides:
+            return self._parent_overrides[id_]
+        return self.parents[self.parent_offsets[id_]:self.parent_offsets[id_ + 1]]
+
+    def topological_order(self, roots: Iterable[int], done: Iterable[int] = ()) -> List[int]:
+        """
+        Every bag reachable from roots, each listed after all of the bags it
+        contains. Iterative depth first search, so any depth of nesting is fine.
+        Bags in done (already dealt with by the caller) are neither listed nor
+        searched below.
+
+        Raises:
+            ValueError: if some bag (eventually) contains itself.
+        """
+        self.compile()
+        state = bytearray(len(self.names)) # 0 new, 1 in progress, 2 done
+        for id_ in done:
+            state[id_] = 2
+        order: List[int] = []
+        for root in roots:
+            if state[root]:
+                continue
+
+            state[root] = 1
+            stack = [root]
+            children = [self._child_ids(root)] # the rest to follow, per stack entry
+            while stack:
+                for child in children[-1]:
+                    if state[child] == 1:
+                        raise ValueError(f'bag "{self.names[child]}" contains itself')
+                    if state[child] == 0:
+                        state[child] = 1
+                        stack.append(child)
+                        children.append(self._child_ids(child))
+                        break
+                else: # all children done
+                    children.pop()
+                    node = stack.pop()
+                    state[node] = 2
+                    order.append(node)
+
+        return order
+
+    def total(self, id_: int) -> int:
+        """Number of bags inside, all the way down. Memoized."""
+        if self._totals[id_] is None:
+            self._count_totals(self.topological_order([id_]))
+        return self._totals[id_]
+
+    def count_all(self):
+        """Every bag's total, bottom up, in O(bags + rules)."""
+        self._count_totals(self.topological_order(range(len(self.names))))
+
+    def _count_totals(self, order: List[int]):
+        self._memoized = True
+        totals = self._totals
+        for i in order:
+            if totals[i] is None:
+                totals[i] = sum([(totals[c] + 1) * n for c, n in self.children_of(i)])
+
+    def closure(self, id_: int) -> Dict[int, int]:
+        """How many of each bag are inside, all the way down. Memoized."""
+        if id_ not in self._closures:
+            self._close(self.topological_order([id_]))
+        return self._closures[id_]
+
+    def close_all(self):
+        self._close(self.topological_order(range(len(self.names))))
+
+    def finalize_all(self):
+        """Memoize whatever this graph keeps for every bag."""
+        if self.sparse:
+            self.count_all()
+        else:
+            self.close_all()
+
+    def is_final(self, id_: int) -> bool:
+        if self.sparse:
+            return self._totals[id_] is not None
+        return id_ in self._closures
+
+    def path_count(self, outer: int, inner: int) -> int:
+        """
+        How many inner bags are (eventually) inside one outer bag: over every
+        path between them, the product of the counts along it. Propagated up
+        from inner through the bags below outer, without any closures.
+        """
+        paths = {inner: 1}
+        for i in self.topological_order([outer], done=[inner]):
+            paths[i] = sum([n * paths[c] for c, n in self.children_of(i)])
+        return paths[outer] if outer != inner else 0
+
+    def _close(self, order: List[int]):
+        self._memoized = True
+        closures = self._closures
+        for i in order:
+            if i in closures:
+                continue
+
+            deep: Dict[int, int] = dict()
+            for child, count in self.children_of(i):
+                deep[child] = deep.get(child, 0) + count
+                for b, c in closures[child].items():
+                    deep[b] = deep.get(b, 0) + count * c
+            closures[i] = deep
+
+    def containers_of(self, id_: int) -> Set[int]:
+        """
+        Ids of all bags that (eventually) contain this one. A breadth first
+        search up the parent links, so it only touches those bags.
+        """
+        found: Set[int] = set()
+        queue = deque([id_])
+        while queue:
+            for parent in self.parents_of(queue.popleft()):
+                if parent not in found:
+                    found.add(parent)
+                    queue.append(parent)
+        return found
+
 
 class Bag:
+    """A view of one bag colour in a BagGraph."""
 
-    def __init__(self, name: str):
-        self.name: str = name
-        self._children: Dict[Bag, int] = dict()
+    __slots__ = ('graph', 'id')
 
-        self._deep_children: Dict[Bag, int] = dict()
-        self._is_final: bool = False
+    def __init__(self, graph: BagGraph, id_: int):
+        self.graph = graph
+        self.id = id_
 
     def __hash__(self):
-        return hash(self.name)
+        return self.id
 
-    @property
-    def is_final(self):
-        return self._is_final
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Bag) and self.graph is other.graph and self.id == other.id
 
-    def add(self, bag: Bag, count: int):
-        if bag in self._children:
-            warn(f'bag "{bag}" is already a child in {self.name}')
+    def __repr__(self):
+        return f'Bag({self.name!r})'
 
-        self._children[bag] = count
+    @property
+    def name(self) -> str:
+        return self.graph.names[self.id]
 
-    def finalize(self):
-        if self._is_final:
-            return
+    @property
+    def is_final(self):
+        return self.graph.is_final(self.id)
 
-        for bag, count in self._children.items():
-            self._deep_children[bag] = count
+    @property
+    def _children(self) -> Dict[Bag, int]:
+        return {Bag(self.graph, c): n for c, n in self.graph.children_of(self.id)}
 
-            if not bag.is_final:
-                bag.finalize()
+    @property
+    def _parents(self) -> Set[Bag]:
+        return {Bag(self.graph, p) for p in self.graph.parents_of(self.id)}
 
-            for b, c in bag._deep_children.items():
-                if b not in self._deep_children:
-                    self._deep_children[b] = count * c
-                else:
-                    self._deep_children[b] += count * c
+    @property
+    def _deep_children(self) -> Dict[Bag, int]:
+        closure = self.graph._closures.get(self.id, dict())
+        return {Bag(self.graph, b): n for b, n in closure.items()}
 
-        self._is_final = True
+    def add(self, bag: Bag, count: int):
+        self.graph.add(self.id, bag.id, count)
+
+    def finalize(self):
+        if self.graph.sparse:
+            self.graph.total(self.id)
+        else:
+            self.graph.closure(self.id)
 
     def deep_count(self, bag: Bag) -> Optional[int]:
-        if not self._is_final:
+        if not self.is_final:
             return None
 
-        return self._deep_children[bag]
+        if self.graph.sparse:
+            return self.graph.path_count(self.id, bag.id)
+        return self.graph._closures[self.id][bag.id]
 
     def deep_count_all(self) -> Optional[int]:
-        if not self._is_final:
+        if not self.is_final:
             return None
 
-        return sum(self._deep_children.values())
+        if self.graph.sparse:
+            return self.graph._totals[self.id]
+        return sum(self.graph._closures[self.id].values())
 
     def deep_contains(self, bag: Bag) -> Optional[int]:
-        if not self._is_final:
+        if not self.is_final:
             return None
 
-        return bag in self._deep_children
-    
+        if self.graph.sparse:
+            return self.graph.path_count(self.id, bag.id) > 0
+        return bag.id in self.graph._closures[self.id]
+
     def count_children(self) -> int:
-        if len(self._children) == 0:
-            return 0
-        
-        return sum([(bag.count_children() + 1) * count for bag, count in self._children.items()])
+        return self.graph.total(self.id)
+
+
+class Bags(Mapping):
+    """Read-only view of a BagGraph's bags, by name."""
+
+    def __init__(self, graph: BagGraph):
+        self.graph = graph
+
+    def __getitem__(self, name: str) -> Bag:
+        return Bag(self.graph, self.graph.ids[name])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.graph.names)
+
+    def __len__(self) -> int:
+        return len(self.graph)
+
+
+class BagQueries:
+    """
+    Answers many questions about one set of rules, parsed once.
+
+    Each bag's deep contents (how many of every bag are inside it) are kept
+    in a least recently used cache of at most maxsize bags. A miss computes
+    the missing bags bottom up, reusing whatever is still cached below them.
+    Editing the graph empties the cache.
+    """
+
+    def __init__(self, graph: BagGraph, maxsize: int = 1024):
+        self.graph = graph
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[int, Dict[int, int]] = OrderedDict()
+        self._edits = graph.edits
+
+    @classmethod
+    def from_file(cls, input_file: Union[Path, str], maxsize: int = 1024) -> BagQueries:
+        handy = HandyHaversacks()
+        handy._parse_input(Path(input_file))
+        return cls(handy.graph, maxsize)
+
+    def deep_count(self, outer: str, inner: str) -> int:
+        """How many inner bags are (eventually) inside one outer bag."""
+        return self._closure(outer).get(self.graph.ids[inner], 0)
+
+    def deep_count_all(self, name: str) -> int:
+        """How many bags are (eventually) inside one of the named bag."""
+        return sum(self._closure(name).values())
+
+    def can_contain(self, outer: str, inner: str) -> bool:
+        return self.graph.ids[inner] in self._closure(outer)
+
+    def _closure(self, name: str) -> Dict[int, int]:
+        id_ = self.graph.ids[name]
+        cache = self._cache
+        if self._edits != self.graph.edits:
+            cache.clear()
+            self._edits = self.graph.edits
+
+        if id_ in cache:
+            self.hits += 1
+            cache.move_to_end(id_)
+            return cache[id_]
+
+        self.misses += 1
+        computed: Dict[int, int] = dict()
+        for i in self.graph.topological_order([id_], done=cache):
+            deep: Dict[int, int] = dict()
+            for child, count in self.graph.children_of(i):
+                deep[child] = deep.get(child, 0) + count
+                below = computed[child] if child in computed else cache[child]
+                for b, c in below.items():
+                    deep[b] = deep.get(b, 0) + count * c
+            computed[i] = deep
+
+        # Bags further down were only needed for this one; keep the most recent
+        for i, deep in computed.items():
+            cache[i] = deep
+        while len(cache) > self.maxsize:
+            cache.popitem(last=False)
+        return computed[id_]
+
+
+# Either the start of a rule (the outer bag) or one of its contents, ex:
+# 'light red bags contain 1 bright white bag, 2 muted yellow bags.' gives
+# ('light red', '', ''), ('', '1', 'bright white'), ('', '2', 'muted yellow')
+_TOKEN = re.compile(r'^(\w+ \w+) bags contain|(\d+) (\w+ \w+) bag', re.MULTILINE)
+
 
 class HandyHaversacks:
 
-    def __init__(self):
-        self.bags: Dict[str, Bag] = dict()
+    def __init__(self, sparse: bool = False):
+        self.graph = BagGraph(sparse)
+        self.bags = Bags(self.graph)
 
     def part_one(self, input_file: Union[Path, str]) -> int:
         if isinstance(input_file, str):
             input_file = Path(input_file)
 
         self._parse_input(input_file)
-        self._finalize_all()
-
-        shiny_gold = self.bags['shiny gold']
-        return sum([bag.deep_contains(shiny_gold) for bag in self.bags.values()])
+        return len(self.containers_of('shiny gold'))
 
     def part_two(self, input_file: Union[Path, str]) -> int:
         if isinstance(input_file, str):
             input_file = Path(input_file)
 
         self._parse_input(input_file)
-        self._finalize_all()
+        self._count_all()
 
         shiny_gold = self.bags['shiny gold']
         return shiny_gold.count_children()
-        
-    def _parse_input(self, file_path: Path):
-        with open(file_path) as input_file:
-            lines = input_file.readlines()
 
-        for line in lines:
-            self._parse_line(line)
+    def containers_of(self, name: str) -> Set[str]:
+        """Names of all bags that (eventually) contain the named bag."""
+        names = self.graph.names
+        return {names[i] for i in self.graph.containers_of(self.graph.ids[name])}
+
+    def add_rule(self, line: str):
+        """
+        Add one rule, in the same format as the input, replacing any earlier
+        rule for that bag. Only what's memoized for the bags containing it is
+        recomputed.
+        """
+        tokens = _TOKEN.findall(line)
+        if not tokens or not tokens[0][0]:
+            raise ValueError(f'not a rule: {line!r}')
+
+        intern = self.graph.intern
+        bag = intern(tokens[0][0])
+        self.graph.set_children(
+            bag, {intern(name): int(count) for _, count, name in tokens[1:]})
+
+    def remove_rule(self, name: str):
+        """The named bag now contains nothing (other rules may still hold it)."""
+        self.graph.set_children(self.graph.ids[name], dict())
+
+    def _parse_input(self, file_path: Path, chunk_size: int = 1 << 20):
+        """
+        Stream the rules in, chunk_size characters at a time. Each chunk is
+        cut at its last newline (the rest is carried into the next one) and
+        scanned with the precompiled patterns, without splitting it into lines.
+        """
+        carry = ''
+        with open(file_path) as input_file:
+            while True:
+                chunk = input_file.read(chunk_size)
+                if not chunk:
+                    break
+
+                chunk = carry + chunk
+                end = chunk.rfind('\n') + 1
+                self._parse_chunk(chunk[:end])
+                carry = chunk[end:]
+
+        self._parse_chunk(carry)
+
+    def _parse_chunk(self, text: str):
+        """
+        Add every complete rule in text to the graph. One pass of _TOKEN finds
+        both the outer bags and their contents; edges are added in bulk.
+        """
+        graph = self.graph
+        ids = graph.ids
+        intern = graph.intern
+        outer = array('i')
+        inner = array('i')
+        counts = array('l')
+
+        bag = 0
+        for name, count, content_name in _TOKEN.findall(text):
+            if name:
+                bag = ids.get(name)
+                if bag is None:
+                    bag = intern(name)
+                continue
+
+            content = ids.get(content_name)
+            if content is None:
+                content = intern(content_name)
+            outer.append(bag)
+            inner.append(content)
+            counts.append(int(count))
+
+        graph.extend(outer, inner, counts)
 
     def _parse_line(self, line: str):
         name = line[:line.find('bags')].strip()
-        if name in self.bags:
-            bag = self.bags[name]
-        else:
-            bag = Bag(name)
-            self.bags[name] = bag
+        bag = self.graph.intern(name)
 
         contents_index = line.find('contain') + len('contain') + 1
         contents_list = line[contents_index:].split(',')
@@ -198,17 +913,17 @@ class HandyHaversacks:
                 break
 
             content_name = ' '.join(parts[1:3]) # ex: 'striped magenta'
-            if content_name in self.bags:
-                content_bag = self.bags[content_name]
-            else:
-                content_bag = Bag(content_name)
-                self.bags[content_name] = content_bag
-
-            bag.add(content_bag, int(parts[0]))
+            self.graph.add(bag, self.graph.intern(content_name), int(parts[0]))
 
     def _finalize_all(self):
-        for bag in self.bags.values():
-            bag.finalize()
+        self.graph.finalize_all()
+
+    def _count_all(self):
+        """
+        Count every bag's contents, bottom up, in O(bags + rules). Cheaper
+        than _finalize_all when only the totals are needed.
+        """
+        self.graph.count_all()
 
 
 if __name__ == '__main__':
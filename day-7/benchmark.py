@@ -0,0 +1,129 @@
+"""
+Benchmarks for the bag rules, on generated rules.
+
+Each measurement is written as one JSON object per line. The parse benchmark
+gives each parser's wall time and throughput in lines per second; the memory
+benchmark gives the bytes kept (and the peak) by finalizing every bag, with
+full closures and with totals only (sparse), on a smaller but wider graph.
+
+Usage:
+    python benchmark.py [--benchmarks parse memory] [--rules N] [--children K]
+                        [--wide-rules N] [--wide-children K] [--seed S] [--repeat R]
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from typing import Callable, Dict
+
+from bags import HandyHaversacks
+
+
+def random_rules(rules: int, children: int = 4, seed: int = 0) -> str:
+    """
+    Rules for bags named 'cN xN', each holding up to children bags with larger
+    numbers, so there are no cycles.
+    """
+    rng = random.Random(seed)
+    lines = []
+    for i in range(rules):
+        inner = rng.sample(range(i + 1, rules), min(children, rules - i - 1))
+        contents = ', '.join(
+            f'{n} c{j} x{j} bag{"s" if n > 1 else ""}'
+            for j, n in ((j, rng.randint(1, 9)) for j in inner))
+        lines.append(f'c{i} x{i} bags contain {contents or "no other bags"}.')
+    return '\n'.join(lines) + '\n'
+
+
+def parse_lines(path: str) -> HandyHaversacks:
+    """The line at a time parser: readlines, then find/split/join."""
+    handy = HandyHaversacks()
+    with open(path) as input_file:
+        for line in input_file.readlines():
+            handy._parse_line(line)
+    return handy
+
+
+def parse_stream(path: str) -> HandyHaversacks:
+    handy = HandyHaversacks()
+    handy._parse_input(path)
+    return handy
+
+
+def parsers() -> Dict[str, Callable[[str], HandyHaversacks]]:
+    return {'lines': parse_lines, 'stream': parse_stream}
+
+
+def finalize_memory(path: str, sparse: bool):
+    """Bytes still allocated after finalizing every bag, and the peak while doing it."""
+    handy = HandyHaversacks(sparse)
+    handy._parse_input(path)
+    handy.graph.compile()
+
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        handy._finalize_all()
+        seconds = time.perf_counter() - start
+        kept, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return kept, peak, seconds
+
+
+def run(args):
+    if 'parse' in args.benchmarks:
+        yield from run_parse(args)
+    if 'memory' in args.benchmarks:
+        yield from run_memory(args)
+
+
+def run_memory(args):
+    with tempfile.NamedTemporaryFile('wt', suffix='.rules', delete=False) as f:
+        f.write(random_rules(args.wide_rules, args.wide_children, args.seed))
+    try:
+        for sparse in (False, True):
+            kept, peak, seconds = finalize_memory(f.name, sparse)
+            yield dict(benchmark='memory', mode='totals' if sparse else 'closures',
+                       rules=args.wide_rules, children=args.wide_children, seed=args.seed,
+                       seconds=seconds, kept_bytes=kept, peak_bytes=peak)
+    finally:
+        os.remove(f.name)
+
+
+def run_parse(args):
+    with tempfile.NamedTemporaryFile('wt', suffix='.rules', delete=False) as f:
+        f.write(random_rules(args.rules, args.children, args.seed))
+    try:
+        for name, parse in parsers().items():
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                parse(f.name)
+            seconds = (time.perf_counter() - start) / args.repeat
+            yield dict(benchmark='parse', parser=name, rules=args.rules,
+                       children=args.children, seed=args.seed, seconds=seconds,
+                       lines_per_second=args.rules / seconds)
+    finally:
+        os.remove(f.name)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--benchmarks', nargs='+', default=['parse', 'memory'],
+                        choices=['parse', 'memory'])
+    parser.add_argument('--rules', type=int, default=100000)
+    parser.add_argument('--children', type=int, default=4, help='most bags in one rule')
+    parser.add_argument('--wide-rules', type=int, default=1000, help='rules for memory')
+    parser.add_argument('--wide-children', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for record in run(args):
+        print(json.dumps(record), flush=True)
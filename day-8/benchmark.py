@@ -0,0 +1,119 @@
+"""
+Benchmarks for the handheld console engines.
+
+The search benchmark runs every variant of the program that part two
+searches (one jmp or nop flipped), without stopping at the fix; the run
+benchmark runs the program as it is, --runs times. Both report instructions
+executed per second, and the run benchmark also the basic blocks executed.
+Results are written as one JSON object per line.
+
+Usage:
+    python benchmark.py [--program FILE | --size N] [--seed S] [--repeat R]
+                        [--runs N]
+"""
+
+import argparse
+import json
+import random
+import time
+
+from typing import Callable, Dict, List
+
+from halting import Blocks, Engine, Halting, Instruction, Ops, Program
+
+
+def random_program(size: int, seed: int = 0) -> List[Instruction]:
+    """Mostly short jumps, forwards and back (never before the start), like the input."""
+    rng = random.Random(seed)
+    ops = [Ops.acc, Ops.acc, Ops.jmp, Ops.nop]
+    return [Instruction(rng.choice(ops), rng.randint(-min(20, line), 30))
+            for line in range(size)]
+
+
+def search_objects(instructions: List[Instruction]):
+    """Halting._run on every variant."""
+    halting = Halting()
+    flipped = {Ops.jmp: Ops.nop, Ops.nop: Ops.jmp}
+    for inst in instructions:
+        if inst.op not in flipped:
+            continue
+        inst.op = flipped[inst.op]
+        halting._run(instructions)
+        inst.op = flipped[inst.op]
+
+
+def search_arrays(instructions: List[Instruction]):
+    """Program.run on every variant."""
+    program = Program.from_instructions(instructions)
+    for line in range(len(program)):
+        if program.flip(line):
+            program.run()
+            program.flip(line)
+
+
+def count_executed(instructions: List[Instruction]) -> int:
+    """Instructions the search runs in total, which is the same for every engine."""
+    program = Program.from_instructions(instructions)
+    executed = 0
+    for line in range(len(program)):
+        if program.flip(line):
+            executed += sum(program.run()[2])
+            program.flip(line)
+    return executed
+
+
+def engines() -> Dict[Engine, Callable[[List[Instruction]], None]]:
+    return {Engine.objects: search_objects, Engine.arrays: search_arrays}
+
+
+def runners(instructions: List[Instruction]) -> Dict[Engine, Callable[[], object]]:
+    """One run of the unchanged program, each compiled up front."""
+    halting = Halting()
+    program = Program.from_instructions(instructions)
+    blocks = Blocks(program)
+    return {
+        Engine.objects: lambda: halting._run(instructions),
+        Engine.arrays: program.run,
+        Engine.blocks: blocks.run,
+    }
+
+
+def run(args):
+    if args.size:
+        instructions = random_program(args.size, args.seed)
+    else:
+        instructions = Halting()._parse_input(args.program)
+
+    executed = count_executed(instructions)
+    for engine, search in engines().items():
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            search(instructions)
+        seconds = (time.perf_counter() - start) / args.repeat
+        yield dict(benchmark='search', engine=engine.name, lines=len(instructions),
+                   executed=executed, seconds=seconds,
+                   instructions_per_second=executed / seconds)
+
+    _, _, stats = Blocks(Program.from_instructions(instructions)).run()
+    for engine, runner in runners(instructions).items():
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            runner()
+        seconds = (time.perf_counter() - start) / args.runs
+        yield dict(benchmark='run', engine=engine.name, lines=len(instructions),
+                   executed=stats.instructions, blocks=stats.blocks, seconds=seconds,
+                   instructions_per_second=stats.instructions / seconds)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--program', default='input')
+    parser.add_argument('--size', type=int, help='generate a program this long instead')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--runs', type=int, default=1000, help='for the run benchmark')
+    args = parser.parse_args()
+
+    for record in run(args):
+        print(json.dumps(record), flush=True)
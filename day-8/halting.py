@@ -5,8 +5,16 @@ https://adventofcode.com/2020/day/8
 """
 
 import enum
+import os
+import struct
+import time
 
-from typing import List, NamedTuple, Tuple
+from array import array
+from collections import Counter, deque
+from itertools import accumulate
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 
 class Ops(enum.Enum):
     acc = enum.auto()
@@ -31,12 +39,408 @@ class Outcome(enum.Enum):
     looped = enum.auto()
 
 
-class Halting:
+class Engine(enum.Enum):
+    objects = enum.auto() # list of Instruction, State per step
+    arrays = enum.auto() # Program, parallel int arrays
+    blocks = enum.auto() # Blocks, a Program's basic blocks
+
+
+# Magic, outcome, final line, accumulator, loop entry (-1 for none), seconds,
+# path length; then the path as zigzag varint line deltas
+_TRACE_HEADER = struct.Struct('<4sBqqqdQ')
+_TRACE_MAGIC = b'HTR1'
+
+
+class Trace(NamedTuple):
+    """One instrumented run: see Program.trace."""
+    outcome: Outcome
+    state: State
+    path: array # lines, in the order executed
+    loop_entry: Optional[int] # the line that would have run a second time
+    seconds: float
+
+    def to_bytes(self) -> bytes:
+        """
+        Compact binary form. The path is stored as the difference from each
+        line to the next, zigzag varint encoded, so the usual step of +1 or a
+        short jump takes a byte.
+        """
+        out = bytearray(_TRACE_HEADER.pack(
+            _TRACE_MAGIC, self.outcome.value, self.state.line, self.state.accum,
+            -1 if self.loop_entry is None else self.loop_entry, self.seconds,
+            len(self.path)))
+
+        previous = 0
+        for line in self.path:
+            delta = line - previous
+            previous = line
+            zigzag = delta * 2 if delta >= 0 else -delta * 2 - 1
+            while zigzag >= 0x80:
+                out.append(zigzag & 0x7f | 0x80)
+                zigzag >>= 7
+            out.append(zigzag)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Trace':
+        """
+        Raises:
+            ValueError: if data isn't a trace, or is cut short.
+        """
+        if data[:4] != _TRACE_MAGIC:
+            raise ValueError('not a trace')
+        if len(data) < _TRACE_HEADER.size:
+            raise ValueError('truncated trace')
+        _, outcome, line, accum, loop_entry, seconds, length = \
+            _TRACE_HEADER.unpack_from(data)
+
+        path = array('l')
+        previous = 0
+        pos = _TRACE_HEADER.size
+        for _ in range(length):
+            zigzag = shift = 0
+            while True:
+                if pos == len(data):
+                    raise ValueError('truncated trace')
+                byte = data[pos]
+                pos += 1
+                zigzag |= (byte & 0x7f) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            previous += zigzag >> 1 if zigzag % 2 == 0 else -(zigzag >> 1) - 1
+            path.append(previous)
+
+        return cls(Outcome(outcome), State(line, accum), path,
+                   None if loop_entry < 0 else loop_entry, seconds)
+
+
+class Profile:
+    """Execution counts per line, and totals, over any number of traced runs."""
+
     def __init__(self):
-        pass
+        self.counts: Counter = Counter()
+        self.loop_entries: Counter = Counter()
+        self.runs = 0
+        self.instructions = 0
+        self.seconds = 0.0
+
+    def record(self, trace: Trace):
+        self.counts.update(trace.path)
+        if trace.loop_entry is not None:
+            self.loop_entries[trace.loop_entry] += 1
+        self.runs += 1
+        self.instructions += len(trace.path)
+        self.seconds += trace.seconds
+
+    def hottest(self, top: int = 10) -> List[Tuple[int, int]]:
+        """(line, times executed) for the most executed lines."""
+        return self.counts.most_common(top)
+
+
+_ACC = Ops.acc.value
+_JMP = Ops.jmp.value
+_NOP = Ops.nop.value
+
+
+class Program:
+    """
+    A program lowered to parallel arrays: ops[line] (an Ops value) and
+    values[line]. Each line's effect is also precomputed, as the next line to
+    run (targets) and the amount added to the accumulator (deltas), so
+    running it needs no dispatch on the op at all.
+    """
+
+    def __init__(self, ops: bytearray, values: array):
+        self.ops = ops
+        self.values = values
+        self.targets = array('l', [0]) * len(ops)
+        self.deltas = array('l', [0]) * len(ops)
+        for line in range(len(ops)):
+            self._lower(line)
+
+    @classmethod
+    def from_instructions(cls, instructions: List[Instruction]) -> 'Program':
+        return cls(bytearray(inst.op.value for inst in instructions),
+                   array('l', (inst.value for inst in instructions)))
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def _lower(self, line: int):
+        op = self.ops[line]
+        value = self.values[line]
+        self.targets[line] = line + value if op == _JMP else line + 1
+        self.deltas[line] = value if op == _ACC else 0
+
+    def flip(self, line: int) -> bool:
+        """Swap a jmp for a nop or back. False (and no change) for an acc."""
+        op = self.ops[line]
+        if op == _ACC:
+            return False
+
+        self.ops[line] = _NOP if op == _JMP else _JMP
+        self._lower(line)
+        return True
+
+    def run(self) -> Tuple[Outcome, State, bytearray]:
+        """
+        As Halting._run, plus which lines were executed (a bytearray of 0/1,
+        so its sum is the number of instructions run). A jump to before the
+        first line also ends the run, rather than wrapping around.
+        """
+        targets = self.targets
+        deltas = self.deltas
+        program_length = len(targets)
+        executed = bytearray(program_length)
+
+        line = 0
+        accum = 0
+        while 0 <= line < program_length:
+            executed[line] = 1
+            target = targets[line]
+            if 0 <= target < program_length and executed[target]:
+                return Outcome.looped, State(line, accum), executed
+            accum += deltas[line]
+            line = target
+
+        return Outcome.terminated, State(line, accum), executed
+
+    def trace(self) -> Trace:
+        """
+        As run, but recording the path taken, where it looped and how long it
+        took. Kept apart from run, so that costs nothing unless asked for.
+        """
+        start = time.perf_counter()
+        targets = self.targets
+        deltas = self.deltas
+        program_length = len(targets)
+        executed = bytearray(program_length)
+        path = array('l')
+
+        line = 0
+        accum = 0
+        while 0 <= line < program_length:
+            executed[line] = 1
+            path.append(line)
+            target = targets[line]
+            if 0 <= target < program_length and executed[target]:
+                return Trace(Outcome.looped, State(line, accum), path, target,
+                             time.perf_counter() - start)
+            accum += deltas[line]
+            line = target
+
+        return Trace(Outcome.terminated, State(line, accum), path, None,
+                     time.perf_counter() - start)
+
+    def finishers(self) -> bytearray:
+        """
+        Which lines, run as they are, lead to the line just past the end (a
+        bytearray of 0/1, with one extra entry for that line itself). Found
+        by a breadth first search back from the end over the reverse control
+        flow graph, so each line is visited once.
+        """
+        program_length = len(self)
+        targets = self.targets
+
+        # Predecessors of each line 0..program_length, counting sorted into
+        # sources[starts[t]:starts[t + 1]]
+        sizes = [0] * (program_length + 2)
+        for target in targets:
+            if 0 <= target <= program_length:
+                sizes[target + 1] += 1
+        starts = list(accumulate(sizes))
+        position = starts[:-1]
+        sources = array('l', [0]) * starts[-1]
+        for line, target in enumerate(targets):
+            if 0 <= target <= program_length:
+                sources[position[target]] = line
+                position[target] += 1
+
+        finishes = bytearray(program_length + 1)
+        finishes[program_length] = 1
+        queue = deque([program_length])
+        while queue:
+            target = queue.popleft()
+            for line in sources[starts[target]:starts[target + 1]]:
+                if not finishes[line]:
+                    finishes[line] = 1
+                    queue.append(line)
+        return finishes
+
+    def repair(self) -> Tuple[int, State]:
+        """
+        Find the one jmp or nop to flip so the program ends just past its
+        last line, in O(lines): the first line on the original (looping) run
+        whose flipped target is a line that finishes. The original run can't
+        pass through that line again, or it would have finished too.
+        Returns the line and the final state; the program is left unchanged.
+
+        Raises:
+            RuntimeError: if the program doesn't loop to begin with, or no
+                single flip does it.
+        """
+        if self.run()[0] != Outcome.looped:
+            raise RuntimeError("program doesn't loop")
 
-    def part_one(self, input_path: str) -> int:
+        finishes = self.finishers()
+        program_length = len(self)
+        ops = self.ops
+        values = self.values
+        targets = self.targets
+        seen = bytearray(program_length)
+
+        line = 0
+        while 0 <= line < program_length and not seen[line]:
+            seen[line] = 1
+            op = ops[line]
+            if op != _ACC:
+                flipped = line + 1 if op == _JMP else line + values[line]
+                if 0 <= flipped <= program_length and finishes[flipped]:
+                    self.flip(line)
+                    _, state, _ = self.run()
+                    self.flip(line)
+                    return line, state
+            line = targets[line]
+
+        raise RuntimeError('no single flip makes the program finish')
+
+
+class BlockStats(NamedTuple):
+    blocks: int # basic blocks executed
+    instructions: int # instructions in them
+
+
+class Blocks:
+    """
+    A Program grouped into basic blocks: runs of lines that are only ever
+    entered at the first and left from the last. Every jump target and every
+    line after a jmp starts a block, so a line can only run twice if its
+    block is entered twice, and loops are found per block.
+
+    Each block is one superinstruction: its accumulator deltas are summed up
+    front, and it has a single successor (a block number, or -1 when it
+    leaves the program).
+    """
+
+    def __init__(self, program: Program):
+        self.program = program
+        program_length = len(program)
+        ops = program.ops
+        targets = program.targets
+
+        leaders = bytearray(program_length + 1)
+        leaders[0] = 1
+        for line in range(program_length):
+            if ops[line] == _JMP:
+                leaders[line + 1] = 1
+                if 0 <= targets[line] < program_length:
+                    leaders[targets[line]] = 1
+        self.starts = array('l', [line for line in range(program_length) if leaders[line]])
+
+        block_of = array('l', [-1]) * program_length
+        for block, start in enumerate(self.starts):
+            block_of[start] = block
+
+        # Each block ends where the next starts; an empty program has none
+        ends = self.starts[1:] + array('l', [program_length] if self.starts else [])
+        self.lasts = array('l', [end - 1 for end in ends])
+        self.deltas = array('l', [sum(program.deltas[start:end])
+                                  for start, end in zip(self.starts, ends)])
+        self.successors = array('l', [block_of[targets[last]]
+                                      if 0 <= targets[last] < program_length else -1
+                                      for last in self.lasts])
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def run(self) -> Tuple[Outcome, State, BlockStats]:
+        """As Program.run, a block at a time, with how much was executed."""
+        starts = self.starts
+        lasts = self.lasts
+        deltas = self.deltas
+        successors = self.successors
+        entered = bytearray(len(starts))
+
+        block = 0 if starts else -1
+        accum = 0
+        blocks = 0
+        instructions = 0
+        exit_line = 0
+        while block >= 0:
+            entered[block] = 1
+            blocks += 1
+            last = lasts[block]
+            instructions += last - starts[block] + 1
+            successor = successors[block]
+            if successor >= 0 and entered[successor]:
+                # Stop before the last line, as Program.run does
+                accum += deltas[block] - self.program.deltas[last]
+                return (Outcome.looped, State(last, accum),
+                        BlockStats(blocks, instructions))
+            accum += deltas[block]
+            exit_line = self.program.targets[last]
+            block = successor
+
+        return Outcome.terminated, State(exit_line, accum), BlockStats(blocks, instructions)
+
+
+class Report(NamedTuple):
+    """What became of one program in a batch."""
+    path: str
+    outcome: Optional[Outcome] # None if it couldn't be read
+    accum: int
+    instructions: int # executed before it finished or looped
+    repaired: Optional[int] = None # line flipped to make it finish, if any
+    error: Optional[str] = None
+
+
+def _check(path: str, repair: bool) -> Report:
+    """Run (and with repair, fix) one program file. Runs in the batch workers."""
+    try:
+        program = Program.from_instructions(Halting()._parse_input(path))
+    except (OSError, KeyError, ValueError, IndexError) as e:
+        return Report(path, None, 0, 0, error=f'{type(e).__name__}: {e}')
+
+    outcome, state, executed = program.run()
+    if repair and outcome == Outcome.looped:
+        try:
+            line, _ = program.repair()
+        except RuntimeError:
+            pass
+        else:
+            program.flip(line)
+            outcome, state, executed = program.run()
+            return Report(path, outcome, state.accum, sum(executed), repaired=line)
+
+    return Report(path, outcome, state.accum, sum(executed))
+
+
+def _check_star(args: Tuple[str, bool]) -> Report:
+    return _check(*args)
+
+
+class Halting:
+    def __init__(self, profile: Optional[Profile] = None):
+        """
+        With a profile, runs on the array engines are traced (per instruction,
+        even with Engine.blocks) and recorded in it.
+        """
+        self.profile = profile
+
+    def part_one(self, input_path: str, engine: Engine = Engine.objects) -> int:
         instructions = self._parse_input(input_path)
+        if engine in (Engine.arrays, Engine.blocks):
+            program = Program.from_instructions(instructions)
+            if self.profile is not None:
+                outcome, state = self._trace(program)
+            else:
+                runner = program if engine == Engine.arrays else Blocks(program)
+                outcome, state, _ = runner.run()
+            if outcome != Outcome.looped:
+                raise RuntimeError('program terminated')
+            print(f'Looped back to line {program.targets[state.line]}.')
+            return state.accum
 
         state = State(line=0, accum=0)
         while True:
@@ -49,8 +453,11 @@ class Halting:
             else:
                 state = new_state
 
-    def part_two(self, input_path: str) -> int:
+    def part_two(self, input_path: str, engine: Engine = Engine.objects) -> int:
         instructions = self._parse_input(input_path)
+        if engine in (Engine.arrays, Engine.blocks):
+            # Flips change the blocks, so repair works on the plain arrays
+            return self._repair(Program.from_instructions(instructions))
 
         for idx, inst in enumerate(instructions):
             original_op = inst.op
@@ -72,6 +479,45 @@ class Halting:
         raise RuntimeError
 
 
+    def batch(self, paths: Union[str, Path, Iterable[Union[str, Path]]],
+              repair: bool = False, workers: Optional[int] = None,
+              chunksize: int = 16) -> Iterator[Report]:
+        """
+        Run many program files, or every file in a directory, yielding a Report
+        for each as soon as it's done (so not in order). With repair, looping
+        programs are fixed if one flip can, and the fixed run is reported.
+
+        workers processes share the work (default os.cpu_count()); with 1 it
+        all happens in this process. A file that can't be read is reported
+        with its error rather than stopping the batch.
+        """
+        if isinstance(paths, (str, Path)):
+            paths = sorted(p for p in Path(paths).iterdir() if p.is_file())
+        jobs = [(str(path), repair) for path in paths]
+
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            yield from map(_check_star, jobs)
+            return
+
+        with Pool(workers) as pool:
+            yield from pool.imap_unordered(_check_star, jobs, chunksize)
+
+    def _repair(self, program: Program) -> int:
+        """part_two, on the array engine."""
+        idx, state = program.repair()
+        if self.profile is not None:
+            program.flip(idx)
+            self._trace(program)
+            program.flip(idx)
+        print(f'Changed instruction on line {idx + 1}')
+        return state.accum
+
+    def _trace(self, program: Program) -> Tuple[Outcome, State]:
+        trace = program.trace()
+        self.profile.record(trace)
+        return trace.outcome, trace.state
+
     def _parse_input(self, input_path: str) -> List[Instruction]:
         with open(input_path, 'rt') as input_file:
             lines = input_file.readlines()
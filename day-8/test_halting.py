@@ -0,0 +1,156 @@
+import unittest
+
+from array import array
+
+from halting import BlockStats, Blocks, Engine, Halting, Ops, Outcome, Profile, Program, Report
+from halting import State, Trace
+
+
+class TestHalting(unittest.TestCase):
+
+    flipped = {Ops.jmp: Ops.nop, Ops.nop: Ops.jmp}
+
+    def test_part_one(self):
+        for engine in Engine:
+            with self.subTest(engine=engine):
+                self.assertEqual(Halting().part_one('test_input', engine), 5)
+
+    def test_part_two(self):
+        for engine in Engine:
+            with self.subTest(engine=engine):
+                self.assertEqual(Halting().part_two('test_input', engine), 8)
+
+    def test_batch(self):
+        expected = [
+            Report('input', Outcome.terminated, 1403, 206, repaired=253),
+            Report('missing', None, 0, 0,
+                   error="FileNotFoundError: [Errno 2] No such file or directory: 'missing'"),
+            Report('test_input', Outcome.terminated, 8, 6, repaired=7),
+        ]
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                reports = Halting().batch(['test_input', 'input', 'missing'], True, workers)
+                self.assertEqual(sorted(reports), expected)
+
+        reports = list(Halting().batch(['test_input'], workers=1))
+        self.assertEqual(reports, [Report('test_input', Outcome.looped, 5, 7)])
+
+    def test_engines_agree(self):
+        halting = Halting()
+        instructions = halting._parse_input('input')
+        program = Program.from_instructions(instructions)
+        for line in range(0, len(program), 7):
+            if not program.flip(line):
+                continue
+            instructions[line].op = self.flipped[instructions[line].op]
+
+            outcome, state, executed = program.run()
+            self.assertEqual((outcome, state), halting._run(instructions))
+            self.assertEqual(list(executed), [int(inst.executed) for inst in instructions])
+
+            program.flip(line)
+            instructions[line].op = self.flipped[instructions[line].op]
+
+
+class TestProgram(unittest.TestCase):
+
+    def test_run(self):
+        program = Program.from_instructions(Halting()._parse_input('test_input'))
+        outcome, state, executed = program.run()
+        self.assertEqual(outcome, Outcome.looped)
+        self.assertEqual(state, State(line=4, accum=5))
+        self.assertEqual(sum(executed), 7)
+
+    def test_flip(self):
+        program = Program.from_instructions(Halting()._parse_input('test_input'))
+        self.assertFalse(program.flip(1)) # acc
+        self.assertTrue(program.flip(7))
+        self.assertEqual(program.run()[:2], (Outcome.terminated, State(line=9, accum=8)))
+        self.assertTrue(program.flip(7))
+        self.assertEqual(program.run()[0], Outcome.looped)
+
+    def test_finishers(self):
+        program = Program.from_instructions(Halting()._parse_input('test_input'))
+        # Only the last line falls off the end; lines 0-7 loop among themselves
+        self.assertEqual(list(program.finishers()), [0, 0, 0, 0, 0, 0, 0, 0, 1, 1])
+
+    def test_repair(self):
+        halting = Halting()
+        program = Program.from_instructions(halting._parse_input('test_input'))
+        self.assertEqual(program.repair(), (7, State(line=9, accum=8)))
+        self.assertEqual(program.run()[0], Outcome.looped) # unchanged
+
+        program = Program.from_instructions(halting._parse_input('input'))
+        line, state = program.repair()
+        self.assertEqual((line + 1, state.accum), (254, 1403))
+
+    def test_repair_impossible(self):
+        program = Program(bytearray([Ops.jmp.value] * 2), array('l', [0, 0]))
+        with self.assertRaises(RuntimeError):
+            program.repair()
+
+    def test_repair_terminating(self):
+        # Already finishes; flipping line 1 would make it loop on itself
+        program = Program(bytearray([Ops.nop.value, Ops.nop.value, Ops.acc.value, Ops.nop.value]),
+                          array('l', [-2, 0, 3, -2]))
+        with self.assertRaises(RuntimeError):
+            program.repair()
+
+    def test_trace(self):
+        program = Program.from_instructions(Halting()._parse_input('test_input'))
+        trace = program.trace()
+        self.assertEqual(trace[:2], program.run()[:2])
+        self.assertEqual(list(trace.path), [0, 1, 2, 6, 7, 3, 4])
+        self.assertEqual(trace.loop_entry, 1)
+
+        data = trace.to_bytes()
+        self.assertEqual(len(data), 45 + 7)
+        self.assertEqual(Trace.from_bytes(data), trace)
+        with self.assertRaises(ValueError):
+            Trace.from_bytes(b'nope' + data[4:])
+        for length in (4, 44, 45, len(data) - 1):
+            with self.subTest(length=length), self.assertRaises(ValueError):
+                Trace.from_bytes(data[:length])
+
+    def test_profile(self):
+        profile = Profile()
+        self.assertEqual(Halting(profile).part_one('test_input', Engine.blocks), 5)
+        self.assertEqual(Halting(profile).part_two('test_input', Engine.arrays), 8)
+        self.assertEqual((profile.runs, profile.instructions), (2, 7 + 6))
+        self.assertEqual(profile.loop_entries, {1: 1})
+        self.assertEqual(profile.hottest(3), [(0, 2), (1, 2), (2, 2)])
+
+
+class TestBlocks(unittest.TestCase):
+
+    def test_blocks(self):
+        blocks = Blocks(Program.from_instructions(Halting()._parse_input('test_input')))
+        self.assertEqual(list(blocks.starts), [0, 1, 3, 5, 6, 8])
+        self.assertEqual(list(blocks.deltas), [0, 1, 3, -99, 1, 6])
+        self.assertEqual(list(blocks.successors), [1, 4, 1, 4, 2, -1])
+
+    def test_run(self):
+        blocks = Blocks(Program.from_instructions(Halting()._parse_input('test_input')))
+        self.assertEqual(blocks.run(), (Outcome.looped, State(line=4, accum=5),
+                                        BlockStats(blocks=4, instructions=7)))
+
+    def test_empty(self):
+        blocks = Blocks(Program(bytearray(), array('l')))
+        self.assertEqual(len(blocks), 0)
+        self.assertEqual(blocks.run(), (Outcome.terminated, State(line=0, accum=0),
+                                        BlockStats(blocks=0, instructions=0)))
+
+    def test_engines_agree(self):
+        program = Program.from_instructions(Halting()._parse_input('input'))
+        for line in range(0, len(program), 5):
+            if not program.flip(line):
+                continue
+            outcome, state, executed = program.run()
+            block_outcome, block_state, stats = Blocks(program).run()
+            self.assertEqual((block_outcome, block_state), (outcome, state))
+            self.assertEqual(stats.instructions, sum(executed))
+            program.flip(line)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Benchmarks for XMAS part one and part two, on generated number streams.
+
+The invalid benchmark has each validator find every invalid number in the
+same random stream (not stopping at the first), and reports numbers checked
+per second. The search benchmark looks for a range summing to the total of
+the last --range numbers of a stream of large numbers (so no earlier range
+does, and the whole stream is passed over), and reports numbers per second.
+Results are written as one JSON object per line.
+
+Usage:
+    python benchmark.py [--benchmarks invalid search] [--count N] [--seed S]
+                        [--preambles 25 1000 ...] [--limit M]
+                        [--validators sets multiset] [--searches window prefix]
+                        [--range N]
+"""
+
+import argparse
+import json
+import random
+import time
+
+from typing import List
+
+from encoding import Encoding, Search, Validator
+
+
+def random_stream(count: int, limit: int, seed: int = 0) -> List[int]:
+    """
+    Numbers below limit. With a small limit relative to the preamble most of
+    them are valid, which is the usual case.
+    """
+    return random.Random(seed).choices(range(limit), k=count)
+
+
+def run(args):
+    if 'invalid' in args.benchmarks:
+        yield from run_invalid(args, random_stream(args.count, args.limit, args.seed))
+    if 'search' in args.benchmarks:
+        yield from run_search(args, random_stream(args.count, 10 ** 12, args.seed))
+
+
+def run_search(args, sequence: List[int]):
+    target = sum(sequence[-args.range:])
+    for search in args.searches:
+        start = time.perf_counter()
+        if search == Search.scan:
+            found = Encoding._sum_to_target(sequence, target)
+            found_range = len(found)
+        else:
+            first, end = Encoding.range_to_target(sequence, target, search)
+            found_range = end - first
+        seconds = time.perf_counter() - start
+        yield dict(benchmark='search', search=search.name, count=args.count,
+                   seed=args.seed, range=found_range,
+                   seconds=seconds, numbers_per_second=args.count / seconds)
+
+
+def run_invalid(args, sequence: List[int]):
+    for preamble_length in args.preambles:
+        for validator in args.validators:
+            start = time.perf_counter()
+            invalid = sum(1 for _ in Encoding.invalid(sequence, preamble_length, validator))
+            seconds = time.perf_counter() - start
+            yield dict(benchmark='invalid', validator=validator.name,
+                       preamble_length=preamble_length, count=args.count,
+                       limit=args.limit, seed=args.seed, invalid=invalid,
+                       seconds=seconds, numbers_per_second=args.count / seconds)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--benchmarks', nargs='+', default=['invalid', 'search'],
+                        choices=['invalid', 'search'])
+    parser.add_argument('--count', type=int, default=10_000_000)
+    parser.add_argument('--preambles', type=int, nargs='+', default=[25, 100])
+    parser.add_argument('--limit', type=int, default=1000, help='numbers are below this')
+    parser.add_argument('--validators', nargs='+', default=list(Validator),
+                        type=lambda name: Validator[name])
+    parser.add_argument('--searches', nargs='+', default=[Search.window, Search.prefix],
+                        type=lambda name: Search[name], help='scan is quadratic')
+    parser.add_argument('--range', type=int, default=20, help='length of the range to find')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for record in run(args):
+        print(json.dumps(record), flush=True)
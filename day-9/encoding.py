@@ -4,30 +4,205 @@ Advent of Code 2020, Day 9 - Encoding Error
 https://adventofcode.com/2020/day/9
 """
 
+import enum
+import sys
+
 from collections import deque
-from typing import Deque, List, Set, Tuple
+from itertools import repeat
+from operator import sub
+from typing import Deque, Dict, Iterable, Iterator, List, Set, TextIO, Tuple, Union
 
 SetDeque = Deque[Set[int]]
 
+class Validator(enum.Enum):
+    sets = enum.auto() # deque of sets of pair sums, rebuilt as the window moves
+    multiset = enum.auto() # Window, value counts with a two-sum lookup
+
+
+class Search(enum.Enum):
+    scan = enum.auto() # try every start, summing until the target or past it
+    window = enum.auto() # two pointers, one pass; non-negative numbers only
+    prefix = enum.auto() # prefix sums in a hash map, one pass; any numbers
+
+
+class Window:
+    """
+    The last length numbers, as a multiset (value -> count), so a number
+    joining or leaving is O(1) and checking for a pair sum is O(length).
+    """
+
+    def __init__(self, length: int):
+        self.length = length
+        self.values: Deque[int] = deque()
+        self.counts: Dict[int, int] = dict()
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def push(self, x: int):
+        """Add x, dropping the oldest number if the window is full."""
+        if len(self.values) == self.length:
+            self.pop()
+        self.values.append(x)
+        self.counts[x] = self.counts.get(x, 0) + 1
+
+    def pop(self) -> int:
+        """Remove and return the oldest number."""
+        x = self.values.popleft()
+        if self.counts[x] == 1:
+            del self.counts[x]
+        else:
+            self.counts[x] -= 1
+        return x
+
+    def has_pair_sum(self, x: int) -> bool:
+        """Whether two of the numbers (at different positions) add up to x."""
+        counts = self.counts
+        # A lone x/2 would pair with itself; leave it out while looking
+        half = x // 2
+        lone_half = x % 2 == 0 and counts.get(half) == 1
+        if lone_half:
+            del counts[half]
+        try:
+            return any(map(counts.__contains__, map(sub, repeat(x), counts)))
+        finally:
+            if lone_half:
+                counts[half] = 1
+
+
 class Encoding:
     @classmethod
-    def part_one(cls, file_path: str, preamble_length: int = 25) -> int:
+    def part_one(cls, file_path: str, preamble_length: int = 25,
+                 validator: Validator = Validator.sets) -> int:
         sequence = cls._parse_input(file_path)
+        for _, x in cls.invalid(sequence, preamble_length, validator):
+            return x
+
+        raise RuntimeError
+
+    @classmethod
+    def invalid(cls, sequence: List[int], preamble_length: int = 25,
+                validator: Validator = Validator.sets) -> Iterator[Tuple[int, int]]:
+        """(index, number) for every number that isn't the sum of two of the previous preamble_length."""
+        if validator == Validator.multiset:
+            yield from cls.stream_invalid(sequence, preamble_length)
+            return
+
         set_deque = cls._preprocess(sequence[:preamble_length])
         for idx in range(preamble_length, len(sequence)):
             is_valid = cls._validate(sequence[idx], set_deque)
             if not is_valid:
-                return sequence[idx]
+                yield idx, sequence[idx]
             cls._update(idx, set_deque, sequence, preamble_length)
 
-        raise RuntimeError
+    @staticmethod
+    def stream_invalid(numbers: Iterable[int],
+                       preamble_length: int = 25) -> Iterator[Tuple[int, int]]:
+        """
+        As invalid, but online: numbers can be any iterable, even an endless
+        one, and only the last preamble_length of them are kept. Each invalid
+        (index, number) is yielded as soon as it's read.
+        """
+        window = Window(preamble_length)
+        for idx, x in enumerate(numbers):
+            if idx >= preamble_length and not window.has_pair_sum(x):
+                yield idx, x
+            window.push(x)
+
+    @staticmethod
+    def read_numbers(source: Union[str, TextIO],
+                     chunk_size: int = 1 << 16) -> Iterator[int]:
+        """
+        Numbers from a file path or an open text file (such as sys.stdin),
+        read chunk_size characters at a time, so a feed of any length is read
+        in constant memory. Numbers are separated by any whitespace.
+        """
+        if isinstance(source, str):
+            with open(source, 'rt') as input_file:
+                yield from Encoding.read_numbers(input_file, chunk_size)
+            return
+
+        partial = '' # a number cut off at the end of the last chunk
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+
+            words = (partial + chunk).split()
+            partial = words.pop() if words and not chunk[-1].isspace() else ''
+            yield from map(int, words)
+
+        if partial:
+            yield int(partial)
 
     @classmethod
-    def part_two(cls, file_path: str, preamble_length: int, target: int) -> int:
+    def part_two(cls, file_path: str, preamble_length: int, target: int,
+                 search: Search = Search.scan) -> int:
         sequence = cls._parse_input(file_path)
-        seq_slice = cls._sum_to_target(sequence, target)
+        if search == Search.scan:
+            seq_slice = cls._sum_to_target(sequence, target)
+        else:
+            start, end = cls.range_to_target(sequence, target, search)
+            seq_slice = sequence[start:end]
         return min(seq_slice) + max(seq_slice)
 
+    @classmethod
+    def range_to_target(cls, sequence: List[int], target: int,
+                        search: Search = Search.prefix) -> Tuple[int, int]:
+        """
+        Find an interval of sequence (at least one number) that sums to target,
+        in one pass.
+
+        Returns:
+            (start, end) of the interval, as for a slice: the one ending first,
+            and of those the longest. For non-negative numbers that's also the
+            one starting first, which is what _sum_to_target finds.
+
+        Raises:
+            RuntimeError: if suitable range not found.
+            ValueError: for Search.window, if a number is negative.
+        """
+        if search == Search.window:
+            return cls._window_to_target(sequence, target)
+        if search == Search.prefix:
+            return cls._prefix_to_target(sequence, target)
+        raise ValueError(search)
+
+    @staticmethod
+    def _window_to_target(sequence: List[int], target: int) -> Tuple[int, int]:
+        """Grow the window at the end; shrink it from the start while it's over."""
+        start = 0
+        sum_ = 0
+        for end, x in enumerate(sequence, 1):
+            if x < 0:
+                raise ValueError(f'negative number {x} at {end - 1}')
+            sum_ += x
+            while sum_ > target and end - start > 1:
+                sum_ -= sequence[start]
+                start += 1
+            if sum_ == target:
+                return start, end
+
+        raise RuntimeError
+
+    @staticmethod
+    def _prefix_to_target(sequence: List[int], target: int) -> Tuple[int, int]:
+        """
+        An interval sums to target exactly when the sums of everything before
+        its end and before its start differ by target. Keep the first index
+        each prefix sum was seen at, and look each new one up as it comes.
+        """
+        first_seen = {0: 0}
+        sum_ = 0
+        for end, x in enumerate(sequence, 1):
+            sum_ += x
+            start = first_seen.get(sum_ - target)
+            if start is not None:
+                return start, end
+            first_seen.setdefault(sum_, end)
+
+        raise RuntimeError
+
     @staticmethod
     def _parse_input(file_path: str) -> List[int]:
         result = []
@@ -106,6 +281,14 @@ class Encoding:
         raise RuntimeError
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        # Stream mode: encoding.py FILE|- [PREAMBLE_LENGTH]
+        source = sys.stdin if sys.argv[1] == '-' else sys.argv[1]
+        preamble_length = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+        for idx, x in Encoding.stream_invalid(Encoding.read_numbers(source), preamble_length):
+            print(idx, x, flush=True)
+        sys.exit()
+
     encoding = Encoding()
     target = encoding.part_one('input')
     print('Part One:', target)
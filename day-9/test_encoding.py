@@ -1,8 +1,10 @@
+import io
 import unittest
 
 from collections import deque
+from itertools import count, islice
 
-from encoding import Encoding
+from encoding import Encoding, Search, Validator, Window
 
 
 class TestEncoding(unittest.TestCase):
@@ -56,11 +58,69 @@ class TestEncoding(unittest.TestCase):
         expect = self.test_sequence[2:6]
         self.assertEqual(result, expect)
 
+    def test_range_to_target(self):
+        for search in (Search.window, Search.prefix):
+            with self.subTest(search=search):
+                self.assertEqual(Encoding.range_to_target(self.test_sequence, 127, search), (2, 6))
+                self.assertEqual(Encoding.range_to_target([0, 0, 5, 1], 5, search), (0, 3))
+                with self.assertRaises(RuntimeError):
+                    Encoding.range_to_target([1, 2, 3], 7, search)
+
+    def test_range_to_target_negative(self):
+        sequence = [4, -3, 9, -2, 1]
+        self.assertEqual(Encoding.range_to_target(sequence, 8), (0, 4))
+        with self.assertRaises(ValueError):
+            Encoding.range_to_target(sequence, 8, Search.window)
+
     def test_part_one(self):
         self.assertEqual(Encoding.part_one('test_input', 5), 127)
 
+    def test_part_one_multiset(self):
+        self.assertEqual(Encoding.part_one('test_input', 5, Validator.multiset), 127)
+
+    def test_invalid(self):
+        sequence = [1, 2, 3, 3, 6, 12, 5, 20]
+        for validator in Validator:
+            with self.subTest(validator=validator):
+                self.assertEqual(list(Encoding.invalid(sequence, 3, validator)),
+                                 [(5, 12), (6, 5), (7, 20)])
+
+    def test_read_numbers(self):
+        for chunk_size in (1, 2, 3, 1000):
+            with self.subTest(chunk_size=chunk_size):
+                numbers = Encoding.read_numbers(io.StringIO('35\n20 15\n\n102\n576'), chunk_size)
+                self.assertEqual(list(numbers), [35, 20, 15, 102, 576])
+        self.assertEqual(list(Encoding.read_numbers('test_input')), self.test_sequence)
+
+    def test_stream_invalid(self):
+        numbers = Encoding.read_numbers(io.StringIO('\n'.join(map(str, self.test_sequence))), 4)
+        self.assertEqual(list(Encoding.stream_invalid(numbers, 5)), [(14, 127)])
+
+        # Never ends: powers of two aren't the sum of two earlier ones
+        endless = (2 ** n for n in count())
+        self.assertEqual(list(islice(Encoding.stream_invalid(endless, 3), 2)),
+                         [(3, 8), (4, 16)])
+
+    def test_window(self):
+        window = Window(3)
+        for x in [10, 5, 5]:
+            window.push(x)
+        self.assertTrue(window.has_pair_sum(10)) # 5 + 5, two of them
+        self.assertTrue(window.has_pair_sum(15))
+        self.assertFalse(window.has_pair_sum(20)) # only one 10
+
+        window.push(7)
+        self.assertEqual(len(window), 3)
+        self.assertEqual(window.counts, {5: 2, 7: 1})
+        self.assertFalse(window.has_pair_sum(14))
+        self.assertTrue(window.has_pair_sum(12))
+        self.assertEqual(window.pop(), 5)
+        self.assertFalse(window.has_pair_sum(10))
+
     def test_part_two(self):
         self.assertEqual(Encoding.part_two('test_input', 5, 127), 62)
+        for search in Search:
+            self.assertEqual(Encoding.part_two('test_input', 5, 127, search), 62)
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file